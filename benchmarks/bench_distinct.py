@@ -0,0 +1,67 @@
+"""Time distinct donor counts from bitmaps against filter + nunique as the donor base grows.
+
+Run from the repository root:  python benchmarks/bench_distinct.py [max_pledges]
+"""
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bitmaps import BitmapIndex
+from data_store import parse_pledges
+from synthetic import pledges_frame
+
+STATUSES = ['one-time', 'Active donor']
+SELECTIONS = [None, [2018], [2019, 2020], list(range(2014, 2025))]
+
+
+def timed(func, repeat=5):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    return result, statistics.median(runs)
+
+
+def nunique_count(df, fiscal_years):
+    mask = df['pledge_status'].isin(STATUSES)
+    if fiscal_years:
+        mask &= df['fiscal_year'].isin(fiscal_years)
+    return df.loc[mask, 'donor_id'].nunique()
+
+
+def main(max_pledges=4_000_000):
+    sizes = [n for n in (10_000, 100_000, 1_000_000, 4_000_000, 10_000_000) if n <= max_pledges]
+    print(f"{'pledges':>10}  {'build s':>8}  {'bitmap KB':>10}  {'nunique ms':>11}  {'bitmap ms':>10}  match")
+    ok = True
+    for n in sizes:
+        path = os.path.join(BENCH_DIR, f".distinct-{n}.csv")
+        pledges_frame(n, padding=0).to_csv(path, index=False)
+        try:
+            df = parse_pledges(path)
+        finally:
+            os.remove(path)
+
+        index, build_s = timed(lambda: BitmapIndex.from_frame(df, 'donor_id', ['fiscal_year', 'pledge_status']), 1)
+        nunique_ms, bitmap_ms, match = [], [], True
+        for fiscal_years in SELECTIONS:
+            expected, seconds = timed(lambda: nunique_count(df, fiscal_years))
+            nunique_ms.append(seconds * 1000)
+            got, seconds = timed(lambda: index.count(fiscal_years, STATUSES))
+            bitmap_ms.append(seconds * 1000)
+            match &= got == expected
+        ok &= match
+        print(f"{n:>10,}  {build_s:>8.2f}  {index.nbytes / 1024:>10,.0f}  {np.mean(nunique_ms):>11.2f}  "
+              f"{np.mean(bitmap_ms):>10.3f}  {match}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 4_000_000))
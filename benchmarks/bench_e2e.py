@@ -0,0 +1,222 @@
+"""End-to-end pipeline benchmark on synthetic data at growing scale.
+
+Run from the repository root:
+
+    python benchmarks/bench_e2e.py [--sizes 100000 1000000 10000000] [--compare OLD.json]
+
+For every size, synthetic inputs (benchmarks/synthetic.py) are generated in
+a scratch directory and each pipeline stage runs in its own process, so its
+peak RSS is measured on its own:
+
+    generate      seeded payments JSON, pledges CSV and FX series
+    ingest        payments JSON served over HTTP -> CSV (ingest.py)
+    convert       CSV snapshot -> exchange_rates.csv (currency_converter.build)
+    startup_cold  import dash_app with an empty data cache
+    startup_warm  import dash_app again, from the Feather cache
+    callbacks     every callback once (cold) and then repeated (median)
+
+Results go to benchmarks/results/e2e-<commit>.json (or --output), tagged
+with the commit and library versions; --compare prints the ratio of every
+timing to an earlier results file.
+"""
+import argparse
+import datetime
+import http.server
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+STAGES = ['ingest', 'convert', 'startup_cold', 'startup_warm', 'callbacks']
+ALL_STAGES = ['generate'] + STAGES
+DEFAULT_SIZES = [100_000, 1_000_000, 10_000_000]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def stage_generate(workdir, rows, seed):
+    from synthetic import generate
+
+    generate(workdir, rows, seed=seed)
+    return {}
+
+
+def stage_ingest(workdir):
+    from bench_ingest import RangeHandler
+    from ingest import ingest
+
+    RangeHandler.path_on_disk = os.path.join(workdir, "one-for-the-world-payments.json")
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        stats = ingest(f"http://127.0.0.1:{server.server_port}/payments.json",
+                       os.path.join(workdir, "one-for-the-world-payments.csv"), resume=False, log=lambda msg: None)
+    finally:
+        server.shutdown()
+    return {'rows': stats['records'], 'rows_per_sec': stats['rows_per_sec']}
+
+
+def stage_convert(workdir):
+    import currency_converter
+
+    currency_converter.build(os.path.join(workdir, "one-for-the-world-payments.csv"),
+                             os.path.join(workdir, currency_converter.OUTPUT_FILE),
+                             os.path.join(workdir, currency_converter.MANIFEST_FILE), workdir, force=True)
+    return {}
+
+
+def stage_startup(workdir):
+    import dash_app  # noqa: F401  (loads every dataset and imports the pages)
+    return {}
+
+
+def post_callback(client, body):
+    """One callback through the Flask test client; background callbacks are polled to completion."""
+    response = client.post('/_dash-update-component', json=body)
+    handles = response.get_json(silent=True) or {}
+    if 'cacheKey' in handles:
+        query = {'cacheKey': handles['cacheKey'], 'job': handles['job']}
+        while response.status_code == 200 and 'response' not in response.get_json():
+            time.sleep(0.01)
+            response = client.post('/_dash-update-component', json=body, query_string=query)
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+
+def stage_callbacks(workdir, repeat=5):
+    from load_test import callback_payloads
+    import dash_app
+
+    client = dash_app.server.test_client()
+    client.get('/')
+    timings = {}
+    for name, body in callback_payloads():
+        runs = []
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            post_callback(client, body)
+            runs.append(time.perf_counter() - start)
+        entry = timings.setdefault(name, {'first': [], 'repeat': []})
+        entry['first'].append(runs[0])
+        entry['repeat'].extend(runs[1:])
+    return {'callbacks': {name: {'first_seconds': statistics.median(entry['first']),
+                                 'repeat_seconds': statistics.median(entry['repeat'])}
+                          for name, entry in sorted(timings.items())}}
+
+
+STAGE_FUNCTIONS = {'ingest': stage_ingest, 'convert': stage_convert, 'startup_cold': stage_startup,
+                   'startup_warm': stage_startup, 'callbacks': stage_callbacks}
+
+
+def run_stage_here(stage, workdir, rows, seed):
+    """Body of a stage process: run it with workdir as the data directory and report one JSON line."""
+    os.chdir(workdir)
+    start = time.perf_counter()
+    result = stage_generate(workdir, rows, seed) if stage == 'generate' else STAGE_FUNCTIONS[stage](workdir)
+    result.update(stage=stage, seconds=time.perf_counter() - start, peak_rss_mb=peak_rss_mb())
+    print(json.dumps(result))
+
+
+def run_stage(stage, workdir, rows, seed, timeout):
+    env = dict(os.environ, OFTW_CACHE_DIR=os.path.join(workdir, ".cache"),
+               OFTW_JOBS_DIR=os.path.join(workdir, f".jobs-{stage}"), PYTHONPATH=ROOT)
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--stage', stage, '--workdir', workdir,
+                                '--sizes', str(rows), '--seed', str(seed)],
+                               env=env, capture_output=True, text=True, timeout=timeout)
+    if completed.returncode != 0:
+        return {'stage': stage, 'error': completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment():
+    import numpy
+    import pandas
+    return {'python': platform.python_version(), 'pandas': pandas.__version__, 'numpy': numpy.__version__,
+            'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+
+def compare(results, baseline_path):
+    """Print each timing next to the same timing in an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old = {(r['rows'], r['stage']): r for r in baseline['results']}
+    print(f"\ncompared with {baseline['commit']} ({baseline_path})")
+    for row in results:
+        before = old.get((row['rows'], row['stage']))
+        if before and 'seconds' in row and 'seconds' in before:
+            print(f"{row['rows']:>10,}  {row['stage']:<13} {before['seconds']:>8.2f}s -> {row['seconds']:>8.2f}s "
+                  f"({row['seconds'] / before['seconds']:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="payments rows per run")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="results file (default benchmarks/results/e2e-<commit>.json)")
+    parser.add_argument('--compare', metavar='OLD.json', help="print ratios against an earlier results file")
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directories")
+    parser.add_argument('--timeout', type=int, default=3600, help="seconds per stage")
+    parser.add_argument('--stage', choices=ALL_STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.stage:
+        run_stage_here(args.stage, args.workdir, args.sizes[0], args.seed)
+        return 0
+
+    commit = git_commit()
+    results = []
+    print(f"{'rows':>10}  {'stage':<13} {'seconds':>9} {'peak RSS MB':>12}")
+    for rows in args.sizes:
+        workdir = tempfile.mkdtemp(prefix=f"oftw-bench-{rows}-")
+        try:
+            for stage in ['generate'] + args.stages:
+                row = dict(run_stage(stage, workdir, rows, args.seed, args.timeout), rows=rows)
+                results.append(row)
+                if 'error' in row:
+                    print(f"{rows:>10,}  {stage:<13} failed: {row['error']}")
+                    continue
+                print(f"{rows:>10,}  {stage:<13} {row['seconds']:>9.2f} {row['peak_rss_mb']:>12,.0f}")
+                for name, timing in row.get('callbacks', {}).items():
+                    print(f"{'':>10}    {name:<32} first {timing['first_seconds'] * 1000:>8.1f} ms, "
+                          f"repeat {timing['repeat_seconds'] * 1000:>8.1f} ms")
+        finally:
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"e2e-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                   'seed': args.seed, 'environment': environment(), 'results': results}, f, indent=2)
+    print(f"results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 1 if any('error' in row for row in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
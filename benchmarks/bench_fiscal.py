@@ -0,0 +1,66 @@
+"""Compare fiscal.add_fiscal_columns with the per-row lambdas the pages used.
+
+Run from the repository root:  python benchmarks/bench_fiscal.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fiscal import add_fiscal_columns, fiscal_labels
+
+
+def get_fiscal_year(date):
+    if pd.isna(date):  # Handle NaT (Not a Time) values
+        return "Unknown"
+    return f"FY{date.year + 1}" if date.month >= 7 else f"FY{date.year}"
+
+
+def legacy_fiscal_columns(df):
+    """The four .apply passes from Objectics.py and Pledge.py."""
+    df['fiscal_year'] = df['date'].apply(lambda x: x.year if x.month >= 7 else x.year - 1)
+    df['fiscal_year_label'] = df['fiscal_year'].apply(lambda x: f"FY {x}-{x+1}")
+    df['fiscal_month_num'] = df['date'].apply(lambda x: x.month - 6 if x.month >= 7 else x.month + 6)
+    df['pledge_fiscal_year'] = df['date'].apply(get_fiscal_year)
+    return df
+
+
+def vectorized_fiscal_columns(df):
+    add_fiscal_columns(df, 'date')
+    df['pledge_fiscal_year'] = fiscal_labels(df['fiscal_year'], fmt="FY{end}", missing="Unknown")
+    return df
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df.copy())
+    return time.perf_counter() - start, result
+
+
+def main(sizes=(100_000, 1_000_000)):
+    rng = np.random.default_rng(0)
+    ok = True
+    for n in sizes:
+        dates = pd.Timestamp("2014-03-01") + pd.to_timedelta(rng.integers(0, 4000, n), unit='D')
+        df = pd.DataFrame({'date': dates})
+
+        legacy_s, legacy = timed(legacy_fiscal_columns, df)
+        vectorized_s, vectorized = timed(vectorized_fiscal_columns, df)
+
+        match = (np.array_equal(legacy['fiscal_year'].to_numpy(), vectorized['fiscal_year'].to_numpy(dtype='int64'))
+                 and np.array_equal(legacy['fiscal_month_num'].to_numpy(),
+                                    vectorized['fiscal_month_num'].to_numpy(dtype='int64'))
+                 and (legacy['fiscal_year_label'] == vectorized['fiscal_year_label']).all()
+                 and (legacy['pledge_fiscal_year'] == vectorized['pledge_fiscal_year']).all())
+        ok &= bool(match)
+        print(f"{n:>9,} rows  apply: {legacy_s:7.3f} s  vectorized: {vectorized_s:7.3f} s  "
+              f"({legacy_s / vectorized_s:,.0f}x)  match: {match}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
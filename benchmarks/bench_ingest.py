@@ -0,0 +1,78 @@
+"""Stream a synthetic multi-million-record payments JSON from a local HTTP server.
+
+Run from the repository root:  python benchmarks/bench_ingest.py [n_records]
+
+The first pass is stopped halfway and resumed with an HTTP Range request; the
+output is then checked against the generated records.
+"""
+import http.server
+import os
+import re
+import sys
+import tempfile
+import threading
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from ingest import ingest
+from synthetic import write_payments_json
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serve one file, honouring single 'bytes=N-' Range requests like a static bucket."""
+    path_on_disk = None
+
+    def do_GET(self):
+        size = os.path.getsize(self.path_on_disk)
+        match = re.match(r"bytes=(\d+)-$", self.headers.get('Range', ''))
+        start = int(match.group(1)) if match else 0
+        self.send_response(206 if match else 200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(size - start))
+        if match:
+            self.send_header('Content-Range', f"bytes {start}-{size - 1}/{size}")
+        self.end_headers()
+        with open(self.path_on_disk, 'rb') as f:
+            f.seek(start)
+            try:
+                while chunk := f.read(1 << 20):
+                    self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client stopped reading (pass 1 ends early on purpose)
+
+    def log_message(self, *args):
+        pass
+
+
+def main(n=2_000_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "payments.json")
+        out = os.path.join(tmp, "payments.csv")
+        write_payments_json(source, n)
+        print(f"source: {n:,} records, {os.path.getsize(source) / 1e6:,.0f} MB")
+
+        RangeHandler.path_on_disk = source
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/payments.json"
+
+        first = ingest(url, out, max_records=n // 2, log=lambda msg: None)
+        print(f"pass 1:  {first['records']:,} records, {first['rows_per_sec']:,.0f} rows/s (stopped)")
+        second = ingest(url, out, log=lambda msg: None)
+        print(f"resume:  {second['records'] - second['resumed_from']:,} records from "
+              f"{second['resumed_from']:,}, {second['rows_per_sec']:,.0f} rows/s")
+        server.shutdown()
+
+        written = pd.read_csv(out, usecols=['id'])['id']
+        ok = len(written) == n and written.iloc[0] == "p0" and written.iloc[-1] == f"p{n - 1}" \
+            and written.is_unique
+        print(f"output complete and in order: {ok}")
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000))
@@ -0,0 +1,81 @@
+"""Time the vectorized pledge valuation against a per-row apply at 1M pledges.
+
+Also checks that the cohort engine's monthly active counts agree with the
+interval index at every month end, so both count the same pledges.
+
+Run from the repository root:  python benchmarks/bench_pledge_value.py [n_pledges]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from cohorts import CohortEngine
+from data_store import parse_pledges
+from fx import RateTable
+from intervals import PledgeIntervalIndex
+from pledge_value import PAYMENTS_PER_YEAR, add_pledge_values, arr_by_fiscal_year
+from synthetic import pledges_frame
+
+
+def rowwise_annual_usd(df, rates):
+    """Per-row reference: look the rate up and annualize one pledge at a time."""
+    factors = {currency: pd.Series(rates.factors[:, i], index=rates.dates)
+               for i, currency in enumerate(rates.currencies)}
+
+    def value(row):
+        amount = row['contribution_amount'] * PAYMENTS_PER_YEAR[row['frequency']]
+        if row['currency'] not in factors:
+            return amount
+        series = factors[row['currency']]
+        return amount * series.iloc[max(series.index.searchsorted(row['pledge_starts_at'], side='right') - 1, 0)]
+
+    return df.apply(value, axis=1).to_numpy()
+
+
+def cohorts_agree(df, intervals):
+    """Whether the cohort engine's active count at the end of each month matches intervals.active_at."""
+    monthly = CohortEngine(df).monthly_activity().iloc[:-1]  # the as-of month is not over yet
+    month_ends = monthly['month'] + pd.offsets.MonthEnd(0)
+    active, _ = intervals.active_at(month_ends)
+    return np.array_equal(monthly['active'].to_numpy(), active)
+
+
+def main(n=1_000_000):
+    rates = RateTable.from_csv()
+    path = os.path.join(BENCH_DIR, f".pledges-{n}.csv")
+    pledges_frame(n, padding=0).to_csv(path, index=False)
+    try:
+        df = parse_pledges(path)
+    finally:
+        os.remove(path)
+
+    start = time.perf_counter()
+    valued = add_pledge_values(df.copy(), rates)
+    intervals = PledgeIntervalIndex.from_pledges(valued)
+    by_year = arr_by_fiscal_year(intervals)
+    vectorized_s = time.perf_counter() - start
+
+    sample = df.sample(min(n, 20_000), random_state=0)
+    start = time.perf_counter()
+    reference = rowwise_annual_usd(sample, rates)
+    rowwise_s = (time.perf_counter() - start) * n / len(sample)
+
+    match = np.allclose(valued.loc[sample.index, 'annual_usd'].to_numpy(), reference)
+    print(f"pledges:     {n:,}  ({len(by_year)} fiscal years)")
+    print(f"vectorized:  {vectorized_s:8.3f} s  (conversion, annualization, interval index and ARR per fiscal year)")
+    print(f"row-wise:    {rowwise_s:8.3f} s  (extrapolated from {len(sample):,} rows)")
+    agree = cohorts_agree(valued, intervals)
+    print(f"results match: {match}")
+    print(f"cohort active counts match the interval index: {agree}")
+    return 0 if match and agree else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,132 @@
+"""Startup time of dash_app with eager, lazy and warm page loading (OFTW_PAGE_LOADING).
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--rows 1000000] [--modes eager lazy warm]
+
+Synthetic payments and pledges (benchmarks/synthetic.py) are converted once
+in a scratch directory and the Feather cache is primed, so every mode starts
+from the same warm files. Each mode then runs in its own process:
+
+    import        import dash_app (what a gunicorn master or worker pays before serving)
+    home          first request for the Home page, which needs no data
+    <page>        first visit of each data page: its layout, built on demand unless preloaded
+    ready         import until every page has been visited once
+    warmup        warm mode: how long the background preload took
+
+In warm mode the page visits run while the warm-up thread is still
+building, so they compete with it for the GIL (or wait for the pieces it
+is building): their timings are the worst case of a visit right after
+start, not what a visit after the warm-up costs. The process waits for the
+warm-up to finish before it reports, so it always exits cleanly.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_e2e import peak_rss_mb, stage_convert
+from synthetic import generate
+
+MODES = ['eager', 'lazy', 'warm']
+PAGES = ['/Objectics', '/Money_Moved', '/Pledge']
+
+
+def visit(server, path):
+    """Build the layout of the page at path inside a request, as the page router does."""
+    import dash
+
+    page = next(page for page in dash.page_registry.values() if page['path'] == path)
+    with server.test_request_context(path):
+        server.preprocess_request()  # pins the dataset version (and starts the warm-up thread)
+        try:
+            layout = page['layout']
+            return layout() if callable(layout) else layout
+        finally:
+            server.do_teardown_request()
+
+
+def run_mode_here(workdir):
+    """Body of a mode process: time the import and the first visits, report one JSON line."""
+    os.chdir(workdir)
+    start = time.perf_counter()
+    import dash_app
+    import data_store
+    result = {'import': time.perf_counter() - start}
+
+    client = dash_app.server.test_client()
+    began = time.perf_counter()
+    client.get('/')
+    result['home'] = time.perf_counter() - began
+    for path in PAGES:
+        began = time.perf_counter()
+        visit(dash_app.server, path)
+        result[path.strip('/')] = time.perf_counter() - began
+    result['ready'] = time.perf_counter() - start
+    data_store.REGISTRY.wait_for_warmup()
+    result.update(warmup=data_store.REGISTRY.warmup_seconds, peak_rss_mb=peak_rss_mb())
+    print(json.dumps(result))
+
+
+def run_mode(mode, workdir, timeout):
+    env = dict(os.environ, OFTW_PAGE_LOADING=mode, OFTW_RELOAD_INTERVAL="0",
+               OFTW_CACHE_DIR=os.path.join(workdir, ".cache"), OFTW_JOBS_DIR=os.path.join(workdir, f".jobs-{mode}"),
+               PYTHONPATH=ROOT)
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--mode-process', '--workdir', workdir],
+                               env=env, capture_output=True, text=True, timeout=timeout)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{mode}: {completed.stderr.strip().splitlines()[-1:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help="synthetic payments rows")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--repeat', type=int, default=3, help="processes per mode (the median is shown)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=int, default=1800, help="seconds per process")
+    parser.add_argument('--mode-process', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode_process:
+        run_mode_here(args.workdir)
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="oftw-startup-")
+    try:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            generate(workdir, args.rows, seed=args.seed, payments_json=False)
+            stage_convert(workdir)
+        finally:
+            os.chdir(cwd)
+        run_mode('eager', workdir, args.timeout)  # primes the Feather cache
+
+        columns = ['import', 'home'] + [path.strip('/') for path in PAGES] + ['ready']
+        print(f"{args.rows:,} payments, median of {args.repeat} processes (seconds)")
+        print(f"{'mode':<6} " + " ".join(f"{column:>11}" for column in columns) + f" {'peak RSS MB':>12}")
+        for mode in args.modes:
+            runs = [run_mode(mode, workdir, args.timeout) for _ in range(args.repeat)]
+            median = {key: sorted(run[key] or 0.0 for run in runs)[len(runs) // 2] for key in runs[0]}
+            warmup = f"  (warm-up took {median['warmup']:.3f})" if mode == 'warm' else ""
+            print(f"{mode:<6} " + " ".join(f"{median[column]:>11.3f}" for column in columns)
+                  + f" {median['peak_rss_mb']:>12,.0f}{warmup}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
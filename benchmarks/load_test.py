@@ -0,0 +1,178 @@
+"""Callback latency under concurrent clients.
+
+Run from the repository root:
+
+    python benchmarks/load_test.py                      # starts gunicorn -c gunicorn.conf.py
+    python benchmarks/load_test.py --dev                # starts the Flask development server instead
+    python benchmarks/load_test.py --url http://host:8050
+
+Each client posts a rotating mix of the dashboard's callbacks (KPIs, chart
+patches, the payments grid and the ARR cards) to /_dash-update-component,
+polling background callbacks until their result arrives, and p50/p99
+latency is reported at 1, 4 and 16 concurrent clients.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fiscal import LABEL_FORMAT
+
+FISCAL_YEARS = [LABEL_FORMAT.format(start=year, end=year + 1) for year in range(2017, 2024)]
+PLATFORMS = [['Stripe'], ['Benevity'], ['Donational', 'Stripe'], []]
+
+
+def callback_payloads():
+    """(name, request body) for every callback the load test exercises."""
+    payloads = []
+    for i, platforms in enumerate(PLATFORMS):
+        payloads.append(('money_moved.update_dashboard', {
+            'output': '..pie-fig.figure...source-fig.figure..',
+            'outputs': [{'id': 'pie-fig', 'property': 'figure'}, {'id': 'source-fig', 'property': 'figure'}],
+            'inputs': [{'id': 'platform-filter', 'property': 'value', 'value': platforms}],
+            'changedPropIds': ['platform-filter.value']}))
+        payloads.append(('money_moved.get_payment_rows', {
+            'output': 'payments-table.getRowsResponse',
+            'outputs': {'id': 'payments-table', 'property': 'getRowsResponse'},
+            'inputs': [{'id': 'payments-table', 'property': 'getRowsRequest',
+                        'value': {'startRow': 100 * i, 'endRow': 100 * (i + 1), 'filterModel': {},
+                                  'sortModel': [{'colId': 'amount_usd', 'sort': 'desc'}]}}],
+            'state': [{'id': 'platform-filter', 'property': 'value', 'value': platforms}],
+            'changedPropIds': ['payments-table.getRowsRequest']}))
+    for i in range(len(FISCAL_YEARS)):
+        selected = FISCAL_YEARS[i:i + 2]
+        payloads.append(('objectics.update_kpis', {
+            'output': '..kpi-money-moved.children...kpi-arr.children...kpi-attrition-rate.children'
+                      '...kpi-active-donors.children...kpi-active-pledges.children..',
+            'outputs': [{'id': key, 'property': 'children'} for key in
+                        ['kpi-money-moved', 'kpi-arr', 'kpi-attrition-rate', 'kpi-active-donors',
+                         'kpi-active-pledges']],
+            'inputs': [{'id': 'fiscal-year-dropdown', 'property': 'value', 'value': selected}],
+            'changedPropIds': ['fiscal-year-dropdown.value']}))
+        payloads.append(('pledge.update_arr_kpis', {
+            'output': 'pledges-arr-kpis.children',
+            'outputs': {'id': 'pledges-arr-kpis', 'property': 'children'},
+            'inputs': [{'id': 'pledges-as-of', 'property': 'date', 'value': f"{2018 + i}-03-15"}],
+            'changedPropIds': ['pledges-as-of.date']}))
+    return payloads
+
+
+def post_callback(session, url, name, body, poll_interval=0.05):
+    """One callback round trip; background callbacks are polled until their result arrives."""
+    response = session.post(url + "/_dash-update-component", json=body, timeout=120)
+    if response.status_code == 200 and 'cacheKey' in response.json():
+        handles = response.json()
+        params = {'cacheKey': handles['cacheKey'], 'job': handles['job']}
+        while response.status_code == 200 and 'response' not in response.json():
+            time.sleep(poll_interval)
+            response = session.post(url + "/_dash-update-component", params=params, json=body, timeout=120)
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"{name}: HTTP {response.status_code}: {response.text[:200]}")
+
+
+def run_level(url, clients, requests_per_client, payloads):
+    """Latencies (seconds) per callback name with `clients` concurrent sessions."""
+    latencies = {}
+    lock = threading.Lock()
+
+    def client(index):
+        own = []
+        with requests.Session() as session:
+            for i in range(requests_per_client):
+                name, body = payloads[(index * 7 + i) % len(payloads)]
+                start = time.perf_counter()
+                post_callback(session, url, name, body)
+                own.append((name, time.perf_counter() - start))
+        with lock:
+            for name, elapsed in own:
+                latencies.setdefault(name, []).append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(client, range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def wait_until_up(url, process, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if requests.get(url + "/", timeout=5).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_server(args):
+    env = dict(os.environ, PORT=str(args.port))
+    if args.dev:
+        command = [sys.executable, "dash_app.py"]
+    else:
+        env.update(WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(args.threads))
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "dash_app:server"]
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="test a running server instead of starting one")
+    parser.add_argument('--dev', action='store_true', help="start the Flask development server")
+    parser.add_argument('--port', type=int, default=8051)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=50, help="requests per client at every level")
+    parser.add_argument('--json', metavar='PATH', help="also write the results here")
+    args = parser.parse_args(argv)
+
+    process = None if args.url else start_server(args)
+    url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+    results = []
+    try:
+        wait_until_up(url, process)
+        payloads = callback_payloads()
+        run_level(url, 1, len(payloads), payloads)  # warm-up: every callback once
+
+        print(f"{'clients':>7}  {'requests':>8}  {'req/s':>8}  {'p50 ms':>8}  {'p99 ms':>8}")
+        for clients in args.clients:
+            latencies, seconds = run_level(url, clients, args.requests, payloads)
+            every = np.concatenate([np.asarray(values) for values in latencies.values()]) * 1000
+            row = {'clients': clients, 'requests': len(every), 'requests_per_sec': len(every) / seconds,
+                   'p50_ms': float(np.percentile(every, 50)), 'p99_ms': float(np.percentile(every, 99)),
+                   'callbacks': {name: {'p50_ms': float(np.percentile(values, 50) * 1000),
+                                        'p99_ms': float(np.percentile(values, 99) * 1000)}
+                                 for name, values in sorted(latencies.items())}}
+            results.append(row)
+            print(f"{clients:>7}  {row['requests']:>8}  {row['requests_per_sec']:>8.1f}  "
+                  f"{row['p50_ms']:>8.1f}  {row['p99_ms']:>8.1f}")
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'url': url, 'server': 'external' if args.url else 'dev' if args.dev else
+                       f"gunicorn {args.workers}x{args.threads}", 'levels': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
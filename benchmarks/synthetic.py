@@ -0,0 +1,164 @@
+"""Seeded synthetic payments, pledges and FRED exchange-rate series.
+
+The generated files have the same names and schemas as the real inputs
+(the payments JSON export and its CSV snapshot, the pledges CSV with its
+dd/mm/yyyy dates and empty padding rows, and the DEX*_exchange_rates.csv
+series) and a similar currency, platform, chapter and status mix, so the
+whole pipeline can run on them at any scale. Rows are written in chunks, so
+generating 10M payments does not need 10M rows in memory.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from fx import FRED_SERIES
+
+START_DATE = "2014-03-03"
+END_DATE = "2025-02-28"
+CHUNK_ROWS = 500_000
+
+CURRENCIES = {'USD': .60, 'GBP': .15, 'EUR': .08, 'AUD': .07, 'CAD': .05, 'SGD': .03, 'CHF': .02}
+PAYMENT_PLATFORMS = {'Donational': .35, 'Stripe': .2, 'Benevity': .15, 'CAF': .1, 'Check': .08, 'PayPal': .07,
+                     'Network for Good': .05}
+PORTFOLIOS = {'Top Charities': .7, 'Entire OFTW Portfolio': .2, 'Custom': .1}
+PLEDGE_PLATFORMS = {'Donational': .55, 'Unspecified': .07, 'CAF': .07, 'Check': .06, 'Network for Good': .04,
+                    'Double Up Drive': .04, 'YourCause': .04, 'Squarespace': .04, 'Benevity': .03,
+                    'Cybergrants': .03, 'Fidelity DAF': .03}
+CHAPTERS = {None: .3, 'Columbia University': .25, 'George Washington University': .06,
+            'Georgetown University': .05, 'Australian National University': .04, 'Brown University': .04,
+            'Durham University': .04, 'Darden School of Business (UVA)': .04, 'Duke University': .04,
+            'Fort Lewis College': .04, 'California Institute of Technology': .05, 'Boston College': .05}
+CHAPTER_TYPES = {'UG': .9, 'MBA': .05, 'Corporate': .05}
+PLEDGE_STATUS = {'One-Time': .34, 'Churned donor': .21, 'Active donor': .16, 'Updated': .15,
+                 'Payment failure': .1, 'Pledged donor': .04, 'ERROR': .0003}
+# Share of each status without a pledge_ended_at, as in the real export: superseded 'Updated'
+# rows almost never get one
+NO_END_DATE = {'One-Time': 1.0, 'Churned donor': 0.0, 'Active donor': 1.0, 'Updated': .98,
+               'Payment failure': .006, 'Pledged donor': 1.0, 'ERROR': 1.0}
+FREQUENCIES = {'Monthly': .45, 'One-Time': .38, 'Unspecified': .07, 'Annually': .05, 'Quarterly': .04,
+               'Semi-Monthly': .01}
+
+# Rough level of each FRED series, for a plausible random walk
+FX_LEVELS = {'DEXUSUK': 1.4, 'DEXUSAL': 0.75, 'DEXUSEU': 1.15, 'DEXCAUS': 1.3, 'DEXSIUS': 1.37, 'DEXSZUS': 0.95}
+
+
+def _choice(rng, weights, size):
+    values = list(weights)
+    p = np.array(list(weights.values()), dtype='float64')
+    return np.array(values, dtype=object)[rng.choice(len(values), size, p=p / p.sum())]
+
+
+def _uuids(rng, size):
+    high, low = rng.integers(0, 2 ** 63, size), rng.integers(0, 2 ** 63, size)
+    return [f"{h:016x}{l:016x}" for h, l in zip(high, low)]
+
+
+def write_fx(directory, seed=0, start=START_DATE, end=END_DATE):
+    """One DEX*_exchange_rates.csv per FRED series: business days, with holiday gaps."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, end)
+    for series, _ in FRED_SERIES.values():
+        walk = np.exp(np.cumsum(rng.normal(0, 0.004, len(dates))))
+        rates = pd.Series((FX_LEVELS[series] * walk).round(4), index=dates)
+        rates[rng.random(len(dates)) < 0.03] = np.nan  # FRED leaves holidays empty
+        rates.rename_axis('DATE').rename(series).to_csv(os.path.join(directory, f"{series}_exchange_rates.csv"))
+
+
+def payments_chunks(n, seed=0, n_donors=None, chunk_rows=CHUNK_ROWS):
+    """Yield the payments as DataFrames of at most chunk_rows rows (the export's columns)."""
+    rng = np.random.default_rng(seed)
+    n_donors = n_donors or max(n // 20, 1)
+    dates = pd.date_range(START_DATE, END_DATE, freq='D').strftime("%Y-%m-%d").to_numpy()
+    for start in range(0, n, chunk_rows):
+        size = min(chunk_rows, n - start)
+        ids = np.arange(start, start + size)
+        donors = rng.integers(0, n_donors, size)
+        yield pd.DataFrame({
+            'id': [f"p{i}" for i in ids],
+            'donor_id': [f"d{d}" for d in donors],
+            'pledge_id': [f"pl{d}" for d in donors],
+            'amount': rng.gamma(1.5, 70.0, size).round(2),
+            'currency': _choice(rng, CURRENCIES, size),
+            'date': dates[rng.integers(0, len(dates), size)],
+            'payment_platform': _choice(rng, PAYMENT_PLATFORMS, size),
+            'portfolio': _choice(rng, PORTFOLIOS, size),
+            'counterfactuality': rng.random(size).round(2),
+        })
+
+
+def payments_frame(n, seed=0):
+    """All n payments in one DataFrame with parsed dates, for in-memory benchmarks."""
+    df = pd.concat(payments_chunks(n, seed), ignore_index=True)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def write_payments_csv(path, n, seed=0):
+    """The CSV snapshot payments.py writes (one-for-the-world-payments.csv)."""
+    for i, chunk in enumerate(payments_chunks(n, seed)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+
+def write_payments_json(path, n, seed=0):
+    """The JSON array export, one record per line."""
+    with open(path, 'w') as f:
+        f.write('[')
+        for i, chunk in enumerate(payments_chunks(n, seed)):
+            body = chunk.to_json(orient='records')[1:-1].replace('},{', '},\n{')
+            f.write((',\n' if i else '\n') + body)
+        f.write('\n]')
+
+
+def pledges_frame(n, seed=0, padding=0.7):
+    """Pledges in the CSV's schema; `padding` is the share of all-empty rows the real file has."""
+    rng = np.random.default_rng(seed)
+    created = pd.Timestamp(START_DATE) + pd.to_timedelta(rng.integers(0, 4000, n), unit='D')
+    starts = created + pd.to_timedelta(rng.integers(0, 60, n), unit='D')
+    status = _choice(rng, PLEDGE_STATUS, n)
+    frequency = np.where(status == 'One-Time', 'One-Time', _choice(rng, FREQUENCIES, n))
+    ended = starts + pd.to_timedelta(rng.integers(30, 1500, n), unit='D')
+    ended = pd.Series(ended).where(rng.random(n) >= pd.Series(status).map(NO_END_DATE).to_numpy())
+    chapter = _choice(rng, CHAPTERS, n)
+
+    def ddmmyyyy(values):
+        return pd.Series(values).dt.strftime("%d/%m/%Y")
+
+    df = pd.DataFrame({
+        'donor_id': [f"d{d}" for d in rng.integers(0, max(n // 2, 1), n)],
+        'pledge_id': _uuids(rng, n),
+        'donor_chapter': chapter,
+        'chapter_type': np.where(pd.isna(chapter), None, _choice(rng, CHAPTER_TYPES, n)),
+        'pledge_status': status,
+        'pledge_created_at': ddmmyyyy(created),
+        'pledge_starts_at': ddmmyyyy(starts),
+        'pledge_ended_at': ddmmyyyy(ended),
+        'contribution_amount': np.where(frequency == 'One-Time', rng.gamma(1.2, 800.0, n),
+                                        rng.gamma(1.5, 40.0, n)).round(2),
+        'currency': _choice(rng, {k: v for k, v in CURRENCIES.items() if k not in ('SGD', 'CHF')}, n),
+        'frequency': frequency,
+        'payment_platform': _choice(rng, PLEDGE_PLATFORMS, n),
+    })
+    n_padding = int(n * padding / (1 - padding)) if padding else 0
+    return pd.concat([df, pd.DataFrame(index=range(n_padding), columns=df.columns)], ignore_index=True)
+
+
+def generate(directory, payments_rows, pledges_rows=None, seed=0, payments_json=True):
+    """Write every input of the pipeline into directory; returns {name: path}."""
+    os.makedirs(directory, exist_ok=True)
+    pledges_rows = pledges_rows if pledges_rows is not None else max(payments_rows // 10, 1000)
+    paths = {
+        'payments_json': os.path.join(directory, "one-for-the-world-payments.json"),
+        'pledges': os.path.join(directory, "one-for-the-world-pledges.csv"),
+    }
+    write_fx(directory, seed)
+    pledges_frame(pledges_rows, seed + 1).to_csv(paths['pledges'], index=False)
+    if payments_json:
+        write_payments_json(paths['payments_json'], payments_rows, seed + 2)
+    else:
+        paths['payments_csv'] = os.path.join(directory, "one-for-the-world-payments.csv")
+        write_payments_csv(paths['payments_csv'], payments_rows, seed + 2)
+    with open(os.path.join(directory, "synthetic.json"), 'w') as f:
+        json.dump({'payments_rows': payments_rows, 'pledges_rows': pledges_rows, 'seed': seed}, f)
+    return paths
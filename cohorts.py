@@ -0,0 +1,164 @@
+"""Pledge cohort retention and attrition.
+
+A recurring pledge is active from the month of pledge_starts_at until the
+month of pledge_ended_at (exclusive). Which pledges count and when those
+without an end date stop are decided by intervals.pledge_lifetimes, so the
+active counts here agree with PledgeIntervalIndex.active_at: superseded
+pledges are left out, and only live ones are still running at the as-of
+month. Monthly activity comes from one sweep over the
+start and end events on a month grid, and survival curves are Kaplan-Meier
+estimates computed from durations sorted once per group, so nothing scans
+the pledges once per month. Results are cached on the engine.
+"""
+import numpy as np
+import pandas as pd
+
+from fiscal import FISCAL_YEAR_START_MONTH, fiscal_calendar
+from intervals import pledge_lifetimes
+
+
+def month_index(dates):
+    """Months since 1970-01 for each date, and a mask of missing dates."""
+    months = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[M]')
+    missing = np.isnat(months)
+    return np.where(missing, 0, months.astype('int64')), missing
+
+
+def month_start(index):
+    return pd.to_datetime(np.asarray(index, dtype='int64').astype('datetime64[M]'))
+
+
+class CohortEngine:
+    def __init__(self, df, as_of=None):
+        as_of = pd.Timestamp.today() if as_of is None else pd.Timestamp(as_of)
+        self.as_of_month = int(np.datetime64(as_of, 'M').astype('int64'))
+
+        counted, ends = pledge_lifetimes(df)
+        start, _ = month_index(df['pledge_starts_at'])
+        end, no_end = month_index(ends)
+        created, no_created = month_index(df['pledge_created_at'])
+        keep = counted & (start <= self.as_of_month)
+
+        self.start = start[keep]
+        self.ended = ~no_end[keep] & (end[keep] <= self.as_of_month)
+        self.end = np.where(self.ended, end[keep], self.as_of_month + 1)
+        self.cohort = np.where(no_created[keep], self.start, created[keep])
+        self.chapter = df['donor_chapter'].to_numpy(dtype=object)[keep]
+        self.first_month = int(self.start.min()) if len(self.start) else self.as_of_month
+
+        # Last month the export recorded anything in (a pledge created or ended), up to as_of
+        ended_at, no_ended_at = month_index(df['pledge_ended_at'])
+        recorded = np.concatenate([created[~no_created], ended_at[~no_ended_at]])
+        recorded = recorded[recorded <= self.as_of_month]
+        self.last_month = int(recorded.max()) if len(recorded) else self.as_of_month
+        self._cache = {}
+
+    def _groups(self, by):
+        """Integer group codes and labels for by=None, 'donor_chapter' or 'cohort' (fiscal year)."""
+        if by is None:
+            return np.zeros(len(self.start), dtype='int64'), np.array(['All'], dtype=object)
+        if by == 'donor_chapter':
+            codes, labels = pd.factorize(pd.Series(self.chapter).fillna('Unknown'), sort=True)
+            return codes, np.asarray(labels, dtype=object)
+        if by == 'cohort':
+            fiscal_year, _ = fiscal_calendar(self.cohort.astype('datetime64[M]'), FISCAL_YEAR_START_MONTH)
+            codes, labels = pd.factorize(np.asarray(fiscal_year, dtype='int64'), sort=True)
+            return codes, labels
+        raise ValueError(f"unknown grouping: {by!r}")
+
+    def monthly_activity(self, by=None):
+        """Started, ended and active pledges and churn rate per month (and group).
+
+        active is the count at the end of the month; churn_rate is the share of
+        pledges active at some point in the month that ended in it.
+        """
+        key = ('activity', by)
+        if key not in self._cache:
+            codes, labels = self._groups(by)
+            n_months = self.as_of_month - self.first_month + 1
+            events = np.zeros((len(labels), n_months + 1), dtype='int64')
+            started = events.copy()
+            np.add.at(started, (codes, self.start - self.first_month), 1)
+            ended = events.copy()
+            np.add.at(ended, (codes[self.ended], self.end[self.ended] - self.first_month), 1)
+
+            # Sweep: running total of +1 start / -1 end events along the month axis
+            active = np.cumsum(started - ended, axis=1)[:, :n_months]
+            started, ended = started[:, :n_months], ended[:, :n_months]
+            at_risk = active + ended  # active at the month start plus new starts
+            with np.errstate(divide='ignore', invalid='ignore'):
+                churn_rate = np.where(at_risk > 0, ended / at_risk, np.nan)
+
+            months = month_start(np.arange(self.first_month, self.as_of_month + 1))
+            result = pd.DataFrame({
+                'group': np.repeat(labels, n_months),
+                'month': np.tile(months, len(labels)),
+                'started': started.ravel(),
+                'ended': ended.ravel(),
+                'active': active.ravel(),
+                'churn_rate': churn_rate.ravel(),
+            })
+            self._cache[key] = result if by is not None else result.drop(columns='group')
+        return self._cache[key]
+
+    def survival(self, by='cohort'):
+        """Kaplan-Meier survival by months since start, per group.
+
+        Returns columns group, months, at_risk, ended, survival.
+        """
+        key = ('survival', by)
+        if key not in self._cache:
+            codes, labels = self._groups(by)
+            duration = self.end - self.start
+            order = np.lexsort((duration, codes))
+            codes, duration, ended = codes[order], duration[order], self.ended[order]
+
+            frame = pd.DataFrame({'group': codes, 'months': duration, 'ended': ended.astype('int64'),
+                                  'total': 1})
+            steps = frame.groupby(['group', 'months'], sort=False).sum().reset_index()
+            group_size = steps.groupby('group')['total'].transform('sum')
+            removed_before = steps.groupby('group')['total'].cumsum() - steps['total']
+            steps['at_risk'] = group_size - removed_before
+            steps['survival'] = (1 - steps['ended'] / steps['at_risk']).groupby(steps['group']).cumprod()
+            steps['group'] = labels[steps['group'].to_numpy()]
+            self._cache[key] = steps[['group', 'months', 'at_risk', 'ended', 'survival']]
+        return self._cache[key]
+
+    def fiscal_year_activity(self):
+        """Per fiscal year: pledges active when it began, started and ended during it."""
+        if 'fiscal_year' not in self._cache:
+            monthly = self.monthly_activity()
+            fiscal_year, _ = fiscal_calendar(monthly['month'].to_numpy())
+            monthly = monthly.assign(fiscal_year=np.asarray(fiscal_year, dtype='int64'),
+                                     active_at_start=monthly['active'] - monthly['started'] + monthly['ended'])
+            grouped = monthly.groupby('fiscal_year')
+            self._cache['fiscal_year'] = pd.DataFrame({
+                'active_at_start': grouped['active_at_start'].first(),
+                'started': grouped['started'].sum(),
+                'ended': grouped['ended'].sum(),
+            })
+        return self._cache['fiscal_year']
+
+    def attrition_rate(self, fiscal_years=None):
+        """Share of pledges active during the selected fiscal years that ended in them."""
+        table = self.fiscal_year_activity()
+        if fiscal_years:
+            table = table[table.index.isin(fiscal_years)]
+        exposed = (table['active_at_start'] + table['started']).sum()
+        return table['ended'].sum() / exposed if exposed else 0.0
+
+    def churn_window(self, months=12):
+        """First and last month of the `months` complete months before the last month with records.
+
+        The window ends where the data does, not at as_of: an export that
+        stopped months ago would otherwise average months with no
+        cancellations in them.
+        """
+        last = max(self.last_month - 1, self.first_month)
+        return month_start([max(last - months + 1, self.first_month), last])
+
+    def average_monthly_churn(self, months=12):
+        """Mean monthly churn rate over churn_window(months)."""
+        monthly = self.monthly_activity()
+        first, last = self.churn_window(months)
+        return monthly['churn_rate'][monthly['month'].between(first, last)].mean()
@@ -0,0 +1,106 @@
+"""Pre-aggregated payments cube for the dashboard filters.
+
+Payments are summed once per (payment_platform, source, fiscal_year,
+fiscal_month_num) cell. KPI cards and charts are answered by filtering and
+re-summing those cells, so callback cost depends on the number of groups,
+not on the number of payments.
+
+Measures are summed as integer micro-units (1e-6 USD), so sums are exact and
+do not depend on the order rows arrive in: cells built from a day's new
+payments can be merged into the persisted cells (incremental.py) and give
+exactly what a full rebuild would.
+"""
+import numpy as np
+import pandas as pd
+
+from fiscal import fiscal_labels
+
+MEASURES = ['amount_usd', 'counterfactuality']
+
+SCALE = 10 ** 6  # fixed-point units per measure unit
+
+
+def dimensions(source_field):
+    return ['payment_platform', source_field, 'fiscal_year', 'fiscal_month_num']
+
+
+def to_units(values):
+    """Fixed-point int64 units for a float column; NaN counts as 0, like a pandas sum."""
+    return np.rint(np.nan_to_num(np.asarray(values, dtype='float64')) * SCALE).astype('int64')
+
+
+def payment_cells(df, source_field):
+    """Measure units and payment count per cube cell of a prepared payments frame."""
+    by = dimensions(source_field)
+    measures = [m for m in MEASURES if m in df.columns]
+    cells = df[by].assign(**{m: to_units(df[m]) for m in measures}).groupby(
+        by, observed=True, dropna=False)[measures].sum()
+    cells['count'] = df.groupby(by, observed=True, dropna=False).size()
+    return cells.reset_index()
+
+
+def merge_cells(*cells):
+    """Add up cell frames with the same dimensions (exact: every measure is an integer)."""
+    frames = [c for c in cells if c is not None and len(c)]
+    if not frames:
+        return cells[0]
+    by = [column for column in frames[0].columns if column not in MEASURES + ['count']]
+    # Plain dtypes for the keys: the categories of each frame's dimensions differ
+    keys = {column: 'str' for column in by if column not in ('fiscal_year', 'fiscal_month_num')}
+    merged = pd.concat([frame.astype(dict(keys, fiscal_year='Int16', fiscal_month_num='Int8'))
+                        for frame in frames], ignore_index=True)
+    return merged.groupby(by, dropna=False, sort=True).sum().reset_index()
+
+
+class PaymentsCube:
+    def __init__(self, df, source_field):
+        self.source_field = source_field
+        self.dimensions = dimensions(source_field)
+        self._set_cells(payment_cells(df, source_field))
+
+    @classmethod
+    def from_cells(cls, cells, source_field):
+        """A cube over cells from payment_cells / merge_cells (e.g. loaded from disk)."""
+        cube = cls.__new__(cls)
+        cube.source_field = source_field
+        cube.dimensions = dimensions(source_field)
+        cube._set_cells(cells)
+        return cube
+
+    def _set_cells(self, cells):
+        self.measures = [m for m in MEASURES if m in cells.columns] + ['count']
+        self.cells = cells.astype({'fiscal_year': 'Int16', 'fiscal_month_num': 'Int8'})
+
+    def select(self, platforms=None, fiscal_years=None):
+        """Cells matching the platform and fiscal-year filters (None or empty means all)."""
+        cells = self.cells
+        if platforms:
+            cells = cells[cells['payment_platform'].isin(platforms)]
+        if fiscal_years:
+            cells = cells[cells['fiscal_year'].isin(fiscal_years)]
+        return cells
+
+    def query(self, by, platforms=None, fiscal_years=None):
+        """Measures summed by the given dimension(s), as a flat DataFrame."""
+        cells = self.select(platforms, fiscal_years)
+        summed = cells.groupby(by, observed=True)[self.measures].sum().reset_index()
+        for measure in self.measures[:-1]:
+            summed[measure] = summed[measure] / SCALE
+        return summed
+
+    def total(self, measure='amount_usd', platforms=None, fiscal_years=None):
+        units = self.select(platforms, fiscal_years)[measure].sum()
+        return float(units) if measure == 'count' else int(units) / SCALE
+
+    def monthly_average(self, measure='amount_usd', platforms=None, fiscal_years=None):
+        """Mean of the monthly totals over months that have payments (NaN if none)."""
+        monthly = self.query(['fiscal_year', 'fiscal_month_num'], platforms, fiscal_years)
+        return monthly.loc[monthly['count'] > 0, measure].mean() if len(monthly) else float('nan')
+
+    def monthly_totals(self, measure='amount_usd', platforms=None, fiscal_years=None):
+        """Totals per fiscal year and fiscal month, with the FY label the charts use."""
+        monthly = self.query(['fiscal_year', 'fiscal_month_num'], platforms, fiscal_years)
+        monthly['fiscal_month_num'] = monthly['fiscal_month_num'].astype(int)
+        monthly['fiscal_year_label'] = fiscal_labels(monthly['fiscal_year'])
+        return monthly[['fiscal_year_label', 'fiscal_month_num', measure]].sort_values(
+            ['fiscal_year_label', 'fiscal_month_num'], ignore_index=True)
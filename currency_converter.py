@@ -1,57 +1,115 @@
+"""Build step: convert a local payments snapshot to USD and write exchange_rates.csv.
+
+    python currency_converter.py [--payments one-for-the-world-payments.csv] [--force]
+
+The snapshot is the file written by payments.py (CSV) or a saved copy of the
+JSON export. Content hashes of every input are kept in a manifest, and the
+build is skipped when the inputs and the previous output are unchanged.
+Each build also saves the aggregates that incremental.py extends with the
+payments appended later. Importing this module does nothing by itself.
+"""
+import argparse
+import json
+import os
+import sys
+
 import pandas as pd
 
-gbp_USD_df = pd.read_csv('DEXUSUK_exchange_rates.csv')
-gbp_USD_df.rename(columns={'DATE': 'date'}, inplace=True)
-gbp_USD_df['date'] = pd.to_datetime(gbp_USD_df['date'], errors='coerce')
+from data_cache import atomic_write, file_sha256
+from fx import FRED_SERIES, RateTable
+from incremental import AGGREGATES_DIR, save_baseline
+
+PAYMENTS_SNAPSHOT = "one-for-the-world-payments.csv"
+OUTPUT_FILE = "exchange_rates.csv"
+MANIFEST_FILE = "build_manifest.json"
+
+
+def load_payments(path):
+    """Read a payments snapshot (CSV from payments.py or the raw JSON export)."""
+    if path.endswith(".json"):
+        df_payments = pd.read_json(path)
+    else:
+        df_payments = pd.read_csv(path)
+    df_payments['date'] = pd.to_datetime(df_payments['date'], errors='coerce')
+    return df_payments.sort_values(by='date', ignore_index=True)
+
+
+def convert_payments(df_payments, rates):
+    """Add amount_usd with one as-of rate lookup (nearest prior business day)."""
+    df_payments['amount_usd'], report = rates.convert(df_payments['amount'], df_payments['currency'],
+                                                      df_payments['date'])
+    return df_payments, report
+
+
+def build_inputs(payments_path, fx_directory="."):
+    return [payments_path] + [os.path.join(fx_directory, f"{series}_exchange_rates.csv")
+                              for series, _ in FRED_SERIES.values()]
+
+
+def read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(path, manifest):
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    atomic_write(path, write)
 
-cad_USD_df = pd.read_csv('DEXCAUS_exchange_rates.csv')
-cad_USD_df.rename(columns={'DATE': 'date'}, inplace=True)
-cad_USD_df['date'] = pd.to_datetime(cad_USD_df['date'], errors='coerce')
 
-aus_USD_df = pd.read_csv('DEXUSAL_exchange_rates.csv')
-aus_USD_df.rename(columns={'DATE': 'date'}, inplace=True)
-aus_USD_df['date'] = pd.to_datetime(aus_USD_df['date'], errors='coerce')
+def is_up_to_date(manifest, input_hashes, output_path):
+    return (manifest.get('inputs') == input_hashes and os.path.exists(output_path)
+            and manifest.get('output_sha256') == file_sha256(output_path))
 
-eur_USD_df = pd.read_csv('DEXUSEU_exchange_rates.csv')
-eur_USD_df.rename(columns={'DATE': 'date'}, inplace=True)
-eur_USD_df['date'] = pd.to_datetime(eur_USD_df['date'], errors='coerce')
 
-chf_USD_df = pd.read_csv('DEXSZUS_exchange_rates.csv')
-chf_USD_df.rename(columns={'DATE': 'date'}, inplace=True)
-chf_USD_df['date'] = pd.to_datetime(chf_USD_df['date'], errors='coerce')
+def build(payments_path=PAYMENTS_SNAPSHOT, output_path=OUTPUT_FILE, manifest_path=MANIFEST_FILE,
+          fx_directory=".", force=False, debug_dump=None, aggregates_dir=AGGREGATES_DIR):
+    """Convert payments_path into output_path unless nothing changed.
 
-sgd_USD_df = pd.read_csv('DEXSIUS_exchange_rates.csv')
-sgd_USD_df.rename(columns={'DATE': 'date'}, inplace=True)
-sgd_USD_df['date'] = pd.to_datetime(sgd_USD_df['date'], errors='coerce')
+    Returns True when the output was rebuilt.
+    """
+    input_hashes = {path: file_sha256(path) for path in build_inputs(payments_path, fx_directory)}
+    manifest = read_manifest(manifest_path)
+    if not force and is_up_to_date(manifest, input_hashes, output_path):
+        print(f"{output_path} is up to date")
+        return False
 
-df_payments = pd.read_json("https://storage.googleapis.com/plotly-app-challenge/one-for-the-world-payments.json")
-df_payments['date'] = pd.to_datetime(df_payments['date'], errors='coerce')
-df_payments = df_payments.sort_values(by='date')
+    rates = RateTable.from_csv(fx_directory)
+    df_payments, report = convert_payments(load_payments(payments_path), rates)
+    print(f"Converted {report['rows']} payments: {report['stale']} used a stale rate, "
+          f"{report['missing']} could not be converted")
 
-# Merge dataframes on the date column
-df_merged = df_payments.merge(gbp_USD_df, on='date', how='left')
-df_merged = df_merged.merge(cad_USD_df, on='date', how='left')
-df_merged = df_merged.merge(aus_USD_df, on='date', how='left')
-df_merged = df_merged.merge(eur_USD_df, on='date', how='left')
-df_merged = df_merged.merge(chf_USD_df, on='date', how='left')
-df_merged = df_merged.merge(sgd_USD_df, on='date', how='left')
+    # Optional csv sheet to look over the updated dataframe and verify exchange rate conversions worked
+    if debug_dump:
+        df_payments.to_csv(debug_dump)
 
+    atomic_write(output_path, lambda tmp_path: df_payments.to_csv(tmp_path, index=False))
+    write_manifest(manifest_path, {'inputs': input_hashes, 'snapshot_size': os.path.getsize(payments_path),
+                                   'output': output_path, 'output_sha256': file_sha256(output_path),
+                                   'report': report})
+    save_baseline(df_payments, payments_path, output_path, aggregates_dir)
+    return True
 
-# Convert currencies to USD
-df_merged['amount_usd'] = df_merged.apply(
-    lambda row: row['amount'] * row['DEXUSUK'] if row['currency'] == 'GBP' else
-                row['amount'] / row['DEXCAUS'] if row['currency'] == 'CAD' else
-                row['amount'] * row['DEXUSAL'] if row['currency'] == 'AUD' else
-                row['amount'] * row['DEXUSEU'] if row['currency'] == 'EUR' else
-                row['amount'] / row['DEXSIUS'] if row['currency'] == 'SGD' else
-                row['amount'] / row['DEXSZUS'] if row['currency'] == 'CHF' else
-                row['amount'], axis=1
-)
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert payments to USD and write exchange_rates.csv.")
+    parser.add_argument('--payments', default=PAYMENTS_SNAPSHOT, help="local payments snapshot (CSV or JSON)")
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--manifest', default=MANIFEST_FILE)
+    parser.add_argument('--fx-directory', default=".", help="directory holding the DEX*_exchange_rates.csv files")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the inputs are unchanged")
+    parser.add_argument('--debug-dump', metavar='PATH', help="also write the converted frame with its index here")
+    parser.add_argument('--aggregates', default=AGGREGATES_DIR, help="directory for the saved aggregates")
+    args = parser.parse_args(argv)
 
-# Create csv sheet to look over the updated dataframe and verify exchange rate conversions worked
-df_merged.to_csv('merged_data.csv')
+    build(args.payments, args.output, args.manifest, args.fx_directory, args.force, args.debug_dump,
+          args.aggregates)
+    return 0
 
-# remove the exchange rate columns from the dataframe
-df_merged = df_merged.drop(['DEXUSUK', 'DEXCAUS', 'DEXUSAL', 'DEXUSEU', 'DEXSIUS', 'DEXSZUS'], axis=1)
 
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,36 @@
+import os
+
 import dash
 import dash_bootstrap_components as dbc
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, clientside_callback
+
+import data_store
+import metrics
+from jobs import LocalJobManager
+
+# Heavy callbacks (background=True) run as local background jobs; results are
+# reused until the dataset (or, for the as-of-today KPIs, the month) changes
+background_callback_manager = LocalJobManager(cache_by=[data_store.dataset_version, data_store.this_month])
 
 # Inicializáljuk az alkalmazást
-app = Dash(__name__, external_stylesheets=[dbc.themes.DARKLY], use_pages=True)
+# Lazy page loading (see below) skips the validation layout: Dash would build
+# it on the first request by calling every page's layout, loading all the data
+app = Dash(__name__, external_stylesheets=[dbc.themes.DARKLY], use_pages=True,
+           background_callback_manager=background_callback_manager,
+           suppress_callback_exceptions=data_store.PAGE_LOADING != 'eager')
+
+# WSGI entry point: gunicorn -c gunicorn.conf.py dash_app:server
+server = app.server
+
+# Load every dataset and page view now that the pages are imported (under
+# gunicorn with preload_app, before the workers are forked). With
+# OFTW_PAGE_LOADING=lazy or warm only the page routes are registered here and
+# each page's data is built on its first visit (warm: also in the background).
+# Each request is pinned to one dataset version; new versions are swapped in
+# as the files change.
+if data_store.PAGE_LOADING == 'eager':
+    data_store.preload()
+data_store.REGISTRY.install(server, warm_up=data_store.PAGE_LOADING == 'warm')
 
 # Alapértelmezett elrendezés
 app.layout = html.Div([
@@ -34,8 +61,17 @@ app.layout = html.Div([
     dash.page_container,  # Az aktuális oldal tartalma fog megjelenni itt
 ])
 
-# 🔥 Callback a linkek aláhúzásához (aktív oldal kiemelése)
-@app.callback(
+# 🔥 Callback a linkek aláhúzásához (aktív oldal kiemelése) — a böngészőben fut, nincs szerverhívás
+clientside_callback(
+    """
+    function(pathname) {
+        const defaultStyle = {"color": "white", "font-size": "25px", "textDecoration": "none"};
+        const selectedStyle = {"color": "white", "border-bottom": "2px solid white",
+                               "padding-bottom": "5px", "font-size": "25px"};
+        return ["/", "/Objectics", "/Money_Moved", "/Pledge"].map(
+            path => pathname === path ? selectedStyle : defaultStyle);
+    }
+    """,
     [
         Output("link-home", "style"),
         Output("link-1", "style"),
@@ -44,18 +80,11 @@ app.layout = html.Div([
     ],
     Input("url", "pathname")
 )
-def update_link_style(pathname):
-    default_style = {"color": "white", "font-size": "25px", "textDecoration": "none"}
-    selected_style = {"color": "white", "border-bottom": "2px solid white",
-                      "padding-bottom": "5px", "font-size": "25px"}
-
-    return (
-        selected_style if pathname == "/" else default_style,
-        selected_style if pathname == "/Objectics" else default_style,
-        selected_style if pathname == "/Money_Moved" else default_style,
-        selected_style if pathname == "/Pledge" else default_style,
-    )
-
-# Futtatjuk az alkalmazást
+
+# Per-callback timings and payload sizes, served at /metrics
+metrics.instrument(app)
+
+# Futtatjuk az alkalmazást (development server; set DASH_DEBUG=1 for the reloader and dev tools)
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=os.environ.get("DASH_DEBUG") == "1", threaded=True,
+            port=int(os.environ.get("PORT", 8050)))
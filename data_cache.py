@@ -0,0 +1,111 @@
+"""On-disk columnar cache for parsed datasets.
+
+Each dataset is stored as an uncompressed Feather (Arrow IPC) file next to a
+small JSON sidecar holding the source file's mtime, size and SHA-256. A warm
+start only stats the source and memory-maps the Feather file; the CSV is
+read again only when its contents actually changed. Files are written to a
+temporary name and renamed into place, so several worker processes can share
+one cache directory safely.
+
+pyarrow is optional: without it every call simply runs the builder.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - optional dependency
+    feather = None
+
+from schema import arrow_types_mapper
+
+CACHE_DIR = os.environ.get("OFTW_CACHE_DIR", ".cache")
+
+# Bump when the way datasets are parsed changes, so old cache files are ignored
+CACHE_VERSION = 3
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write(path, write):
+    """Call write(tmp_path) and move the result over path in one rename."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_meta(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(path, meta):
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+    atomic_write(path, write)
+
+
+def _read_frame(path):
+    return feather.read_table(path, memory_map=True).to_pandas(types_mapper=arrow_types_mapper())
+
+
+def load_cached(name, source, build, cache_dir=None):
+    """Return build(source), served from the Feather cache when it is fresh.
+
+    The cache entry is valid while the source's mtime and size match the
+    sidecar; if they differ the file is hashed and the entry is reused when
+    the content is unchanged. Otherwise build() runs and its result (which
+    must have a default RangeIndex) replaces the cached file.
+    """
+    if feather is None:
+        return build(source)
+
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, f"{name}.json")
+    stat = os.stat(source)
+    meta = _read_meta(meta_path)
+    usable = (meta is not None and meta.get('version') == CACHE_VERSION
+              and os.path.exists(os.path.join(cache_dir, meta['file'])))
+
+    if usable and meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+        return _read_frame(os.path.join(cache_dir, meta['file']))
+
+    digest = file_sha256(source)
+    new_meta = {'version': CACHE_VERSION, 'source': source, 'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size, 'sha256': digest, 'file': f"{name}-{digest[:16]}.feather"}
+
+    if usable and meta['sha256'] == digest:
+        # Touched but unchanged: refresh the stat key only
+        _write_meta(meta_path, dict(new_meta, file=meta['file']))
+        return _read_frame(os.path.join(cache_dir, meta['file']))
+
+    df = build(source)
+    cache_file = os.path.join(cache_dir, new_meta['file'])
+    atomic_write(cache_file, lambda tmp_path: feather.write_feather(df, tmp_path, compression='uncompressed'))
+    _write_meta(meta_path, new_meta)
+    if usable and meta['file'] != new_meta['file']:
+        try:
+            os.remove(os.path.join(cache_dir, meta['file']))
+        except OSError:
+            pass
+    return df
@@ -0,0 +1,290 @@
+"""Load-once data layer shared by every Dash page.
+
+Each dataset is parsed a single time per version with typed columns and its
+derived columns already computed, and kept in the on-disk Feather cache
+(data_cache.py) so later processes skip the CSV parsing altogether. Pages get
+the same frame back on every call and must treat it as read-only: filter or
+aggregate it, never assign into it.
+
+A Dataset holds one version of everything; the registry (registry.py) swaps
+in a new one when the source files change. The get_* functions answer from
+the version pinned to the running request, so pages must call them (or
+get_view) inside layouts and callbacks instead of keeping module globals.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from bitmaps import BitmapIndex
+from cohorts import CohortEngine
+from cube import PaymentsCube
+from data_cache import load_cached
+from fiscal import add_fiscal_columns, fiscal_month_names
+from fx import RateTable
+from incremental import load_fresh_cells, read_state
+from intervals import PledgeIntervalIndex
+from pledge_value import add_pledge_values, arr_by_fiscal_year
+from registry import DatasetRegistry
+from schema import PAYMENTS_SCHEMA, PLEDGES_SCHEMA, apply_schema
+
+PAYMENTS_FILE = "exchange_rates.csv"
+PLEDGES_FILE = "one-for-the-world-pledges.csv"
+
+PLEDGE_DATE_COLUMNS = ['pledge_created_at', 'pledge_starts_at', 'pledge_ended_at']
+PLEDGE_DATE_FORMAT = "%d/%m/%Y"
+
+# Columns read straight into categoricals (schema.py kinds 'category' and 'id')
+PAYMENT_CATEGORIES = [column for column, kind in PAYMENTS_SCHEMA.items() if kind in ('category', 'id')]
+
+MONTH_NAMES = fiscal_month_names()
+
+# When the app loads the data (dash_app.py): 'eager' builds every dataset and
+# page view at startup, 'lazy' on the first request that needs each piece,
+# 'warm' like lazy plus a background preload started by the first request.
+PAGE_LOADING_MODES = ('eager', 'lazy', 'warm')
+PAGE_LOADING = os.environ.get("OFTW_PAGE_LOADING", "eager")
+if PAGE_LOADING not in PAGE_LOADING_MODES:
+    raise ValueError(f"OFTW_PAGE_LOADING must be one of {', '.join(PAGE_LOADING_MODES)}, not {PAGE_LOADING!r}")
+
+
+def payments_source_field(df):
+    """Name of the column that tells where a payment came from."""
+    for column in ['source', 'chapter_name', 'payment_source']:
+        if column in df.columns:
+            return column
+    return 'derived_source'
+
+
+def parse_payments(path):
+    """Converted payments (exchange_rates.csv) with fiscal columns, sorted by date, in PAYMENTS_SCHEMA dtypes."""
+    df = pd.read_csv(path, parse_dates=['date'],
+                     dtype={column: 'category' for column in PAYMENT_CATEGORIES})  # absent columns are ignored
+    return prepare_payments(df)
+
+
+def prepare_payments(df):
+    """Sort converted payments by date and add the fiscal and source columns (also used for deltas)."""
+    df = df.sort_values(by='date', ignore_index=True)
+    add_fiscal_columns(df, 'date')
+
+    if payments_source_field(df) == 'derived_source':
+        df['derived_source'] = pd.Categorical(
+            np.select([df['payment_platform'] == 'Benevity', df['payment_platform'] == 'Stripe'],
+                      ['Corporate', 'Individual'], 'Other'))
+    return apply_schema(df, PAYMENTS_SCHEMA)
+
+
+def parse_pledges(path):
+    """Pledges with parsed dd/mm/yyyy dates and fiscal columns, in PLEDGES_SCHEMA dtypes."""
+    text_columns = list(PLEDGES_SCHEMA) + PLEDGE_DATE_COLUMNS
+    df = pd.read_csv(path, dtype={column: 'str' for column in text_columns})
+    df = df.dropna(how='all').reset_index(drop=True)
+    for column in PLEDGE_DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column], format=PLEDGE_DATE_FORMAT, errors='coerce')
+
+    add_fiscal_columns(df, 'pledge_starts_at')
+    # The schema is applied after dropping the empty padding rows: a parser chunk
+    # made only of those would infer a different category dtype and fail to merge
+    return apply_schema(df, PLEDGES_SCHEMA)
+
+
+def source_version():
+    """Stamp of the source files as they are on disk now (size and mtime of each, and the aggregates version)."""
+    stamps = []
+    for path in [PAYMENTS_FILE, PLEDGES_FILE]:
+        try:
+            stat = os.stat(path)
+            stamps.append(f"{stat.st_size}-{stat.st_mtime_ns}")
+        except OSError:
+            stamps.append("missing")
+    state = read_state()  # bumped by every build and incremental refresh
+    stamps.append(f"v{state['version']}" if state else "v0")
+    return ":".join(stamps)
+
+
+def this_month():
+    """The current calendar month ('YYYY-MM'): the as-of month of the cohorts."""
+    return pd.Timestamp.today().strftime("%Y-%m")
+
+
+def today():
+    """The current date ('YYYY-MM-DD'): the as-of date of the ARR chart."""
+    return pd.Timestamp.today().strftime("%Y-%m-%d")
+
+
+class Dataset:
+    """One version of every dataset and derived structure.
+
+    Each piece is built on first use (or by preload()) and then shared by
+    every request pinned to this version; like the frames themselves, it
+    must be treated as read-only. Pieces computed as of today are stamped
+    with the month or date they were built for and rebuilt when it changes,
+    so a long-running version does not keep the figures of its first day.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self._values = {}
+        self._lock = threading.RLock()  # builders call each other
+        self._stamps = {}  # key -> month or date an as-of-today piece was built for
+
+    def _get(self, key, build):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = build()
+            return self._values[key]
+
+    def _get_as_of(self, key, stamp, build):
+        """_get for a piece computed as of stamp (this_month() or today()): build(stamp) runs again when it changes."""
+        if self._stamps.get(key) != stamp:
+            with self._lock:
+                if self._stamps.get(key) != stamp:
+                    self._values.pop(key, None)
+                    self._stamps[key] = stamp
+        return self._get(key, lambda: build(stamp))
+
+    def payments(self):
+        return self._get('payments', lambda: load_cached('payments', PAYMENTS_FILE, parse_payments))
+
+    def rates(self):
+        return self._get('rates', RateTable.from_csv)
+
+    def pledges(self):
+        """Parsed pledges plus their USD, annualized and monthly values."""
+        return self._get('pledges', lambda: add_pledge_values(load_cached('pledges', PLEDGES_FILE, parse_pledges),
+                                                              self.rates()))
+
+    def pledge_arr(self):
+        """All/active/future ARR per fiscal year, measured at each year's end (today for the current one)."""
+        return self._get_as_of('pledge_arr', today(),
+                               lambda day: arr_by_fiscal_year(self.pledge_intervals(), as_of=day))
+
+    def payments_cube(self):
+        """Payments summed per (platform, source, fiscal year, fiscal month) cell.
+
+        The cells saved by the last build or incremental refresh are used when
+        they match PAYMENTS_FILE as it is on disk; otherwise they are summed
+        from the payments.
+        """
+        def build():
+            cells, state = load_fresh_cells(PAYMENTS_FILE)
+            if cells is not None:
+                return PaymentsCube.from_cells(cells, state['source_field'])
+            df = self.payments()
+            return PaymentsCube(df, payments_source_field(df))
+        return self._get('payments_cube', build)
+
+    def cohorts(self):
+        """Cohort engine over the pledge lifetimes as of the current month (results cached on the engine)."""
+        return self._get_as_of('cohorts', this_month(), lambda month: CohortEngine(self.pledges(), as_of=month))
+
+    def pledge_intervals(self):
+        """Interval index over the recurring pledge lifetimes, for "active as of" queries."""
+        return self._get('pledge_intervals', lambda: PledgeIntervalIndex.from_pledges(self.pledges()))
+
+    def pledge_bitmaps(self, id_column):
+        """Bitmaps of id_column ('donor_id' or 'pledge_id') per (fiscal_year, pledge_status), for distinct counts."""
+        return self._get(('pledge_bitmaps', id_column),
+                         lambda: BitmapIndex.from_frame(self.pledges(), id_column, ['fiscal_year', 'pledge_status']))
+
+    def view(self, name):
+        """The page data VIEWS[name] builds from this version (figures, row models, ...)."""
+        if name in DATED_VIEWS:
+            return self._get_as_of(('view', name), today(), lambda day: VIEWS[name](self))
+        return self._get(('view', name), lambda: VIEWS[name](self))
+
+    def preload(self):
+        """Build every dataset, derived structure and registered page view up front."""
+        self.payments_cube()
+        self.pledge_arr()
+        self.pledge_intervals()
+        self.pledge_bitmaps('donor_id')
+        self.pledge_bitmaps('pledge_id')
+        self.cohorts().monthly_activity()
+        for name in list(VIEWS):
+            self.view(name)
+        return self
+
+
+# Page data builders by name: each takes a Dataset and returns what one page
+# derives from it. Registered by the pages at import time.
+VIEWS = {}
+DATED_VIEWS = set()  # views computed as of today, rebuilt when the date changes
+
+REGISTRY = DatasetRegistry(Dataset, source_version, preload=PAGE_LOADING != 'lazy')
+
+
+def register_view(name, dated=False):
+    """Decorator registering a page data builder under name (see Dataset.view).
+
+    dated=True marks a view built from as-of-today figures (cohorts, ARR),
+    so it is rebuilt when the date changes.
+    """
+    def decorator(build):
+        VIEWS[name] = build
+        if dated:
+            DATED_VIEWS.add(name)
+        return build
+    return decorator
+
+
+def current():
+    """The dataset version of the running request (the latest one outside requests)."""
+    return REGISTRY.current()
+
+
+def dataset_version():
+    """Stamp of the dataset version the running request uses (job cache keys)."""
+    return current().version
+
+
+def get_payments():
+    return current().payments()
+
+
+def get_rates():
+    return current().rates()
+
+
+def get_pledges():
+    return current().pledges()
+
+
+def get_pledge_arr():
+    return current().pledge_arr()
+
+
+def get_payments_cube():
+    return current().payments_cube()
+
+
+def get_cohorts():
+    return current().cohorts()
+
+
+def get_pledge_intervals():
+    return current().pledge_intervals()
+
+
+def get_pledge_bitmaps(id_column):
+    return current().pledge_bitmaps(id_column)
+
+
+def get_view(name):
+    return current().view(name)
+
+
+def preload():
+    """Load the current version with every dataset, derived structure and page view up front.
+
+    Called in the serving master process before it forks workers (after the
+    pages are imported), so they all share the loaded arrays copy-on-write
+    instead of each parsing the files again.
+    """
+    return current().preload()
@@ -1,29 +1,124 @@
-import pandas_datareader.data as web
 import datetime
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
 import pandas as pd
 
+from data_cache import atomic_write
+from fx import FRED_SERIES
+
+SERIES = [series for series, _ in FRED_SERIES.values()]
+DEFAULT_START_DATE = "2014-03-01"
+
+
+def datareader_fetcher(series, start_date, end_date):
+    """Fetch one FRED series with pandas_datareader (date-indexed DataFrame)."""
+    import pandas_datareader.data as web
+    return web.DataReader(series, "fred", start_date, end_date)
+
+
+class FredCsvFetcher:
+    """Fetch FRED series from the fredgraph.csv endpoint of a FRED-compatible server.
+
+    Pointing base_url at a local fake FRED makes the updater testable offline.
+    """
+
+    def __init__(self, base_url="https://fred.stlouisfed.org"):
+        self.base_url = base_url.rstrip('/')
+
+    def __call__(self, series, start_date, end_date):
+        query = urlencode({'id': series, 'cosd': start_date, 'coed': end_date})
+        df = pd.read_csv(f"{self.base_url}/graph/fredgraph.csv?{query}", na_values='.')
+        df = df.rename(columns={df.columns[0]: 'DATE'})
+        df['DATE'] = pd.to_datetime(df['DATE'])
+        return df.set_index('DATE')[[series]]
+
+
+def fill_gaps(df, start=None):
+    """Reindex to every calendar day and fill holidays/weekends from neighbouring observations."""
+    date_range = pd.date_range(start=start if start is not None else df.index.min(), end=df.index.max(), freq='D')
+    df_filled = df.reindex(date_range).bfill().ffill()
+    df_filled.index.name = 'DATE'
+    return df_filled
+
+
+def series_path(series, directory="."):
+    return os.path.join(directory, f"{series}_exchange_rates.csv")
+
+
+def write_series(df, path):
+    """Write a filled series CSV atomically, so a failed run never truncates the file."""
+    atomic_write(path, lambda tmp_path: df.to_csv(tmp_path, index=False, date_format="%Y-%m-%d"))
+
 
-def get_historical_exchange_rates(start_date="2020-01-01", end_date=None):
-    """Fetch historical GBP to USD exchange rates from FRED."""
+def update_series(series, fetcher=datareader_fetcher, end_date=None, directory=".",
+                  start_date=DEFAULT_START_DATE):
+    """Append observations newer than the last stored DATE to one series CSV.
+
+    Returns the number of rows appended.
+    """
     if end_date is None:
         end_date = datetime.datetime.today().strftime("%Y-%m-%d")
+    path = series_path(series, directory)
 
-    try:
-        for currency in ['DEXUSUK', 'DEXCAUS', 'DEXUSAL', 'DEXUSEU', 'DEXSIUS', 'DEXSZUS']:
-            df = web.DataReader(currency, "fred", start_date, end_date)
+    existing = None
+    if os.path.exists(path):
+        existing = pd.read_csv(path, parse_dates=['DATE'])
+        if len(existing):
+            start_date = (existing['DATE'].max() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    if start_date > end_date:
+        return 0
 
-            # Create a new DataFrame with all dates in the range
-            date_range = pd.date_range(start=df.index.min(), end=df.index.max(), freq='D')
+    new = fetcher(series, start_date, end_date)
+    new = new[new.index >= pd.Timestamp(start_date)].dropna(how='all')
+    if new.empty:
+        return 0
 
-            df_filled = df.reindex(date_range).bfill()
-            df_filled.reset_index(inplace=True)
-            df_filled.rename(columns={'index': 'DATE'}, inplace=True)
+    if existing is not None and len(existing):
+        # Fill the gap between the last stored day and the first new observation
+        filled = fill_gaps(new, start=pd.Timestamp(start_date))
+        df = pd.concat([existing, filled.reset_index()], ignore_index=True)
+    else:
+        df = fill_gaps(new).reset_index()
+
+    write_series(df, path)
+    return len(df) - (0 if existing is None else len(existing))
 
-            # save df as a csv sheet
-            df_filled.to_csv(f"{currency}_exchange_rates.csv", index=False)
 
+def update_exchange_rates(fetcher=datareader_fetcher, end_date=None, directory=".", max_workers=len(SERIES)):
+    """Incrementally refresh all six FRED series concurrently.
+
+    Returns {series: rows appended}; a series that failed maps to None and
+    keeps its previous file untouched.
+    """
+    def update(series):
+        try:
+            return update_series(series, fetcher, end_date, directory)
+        except Exception as e:
+            print(f"Error fetching {series}:", e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(SERIES, pool.map(update, SERIES)))
+
+
+def get_historical_exchange_rates(start_date="2020-01-01", end_date=None, fetcher=datareader_fetcher, directory="."):
+    """Fetch the full history of all six FRED series and rewrite their CSVs."""
+    if end_date is None:
+        end_date = datetime.datetime.today().strftime("%Y-%m-%d")
+
+    try:
+        for currency in SERIES:
+            df = fetcher(currency, start_date, end_date)
+
+            # save df as a csv sheet
+            write_series(fill_gaps(df).reset_index(), series_path(currency, directory))
 
     except Exception as e:
         print("Error fetching data:", e)
 
-get_historical_exchange_rates("2014-03-01", "2025-02-28")
\ No newline at end of file
+
+if __name__ == "__main__":
+    for series, added in update_exchange_rates().items():
+        print(f"{series}: {'failed' if added is None else f'{added} new rows'}")
@@ -0,0 +1,54 @@
+"""Fiscal calendar arithmetic on datetime64 arrays.
+
+The fiscal year is named after the calendar year it starts in and, by
+default, starts in July, so July is fiscal month 1 and June is month 12.
+"""
+import calendar
+
+import numpy as np
+import pandas as pd
+
+FISCAL_YEAR_START_MONTH = 7
+
+LABEL_FORMAT = "FY {start}-{end}"
+
+
+def fiscal_calendar(dates, start_month=FISCAL_YEAR_START_MONTH):
+    """Fiscal year (start year) and fiscal month number for every date.
+
+    Both come back as nullable integer arrays; NaT gives <NA>.
+    """
+    months = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[M]')
+    missing = np.isnat(months)
+    shifted = months.astype('int64') - (start_month - 1)  # months since 1970-01, moved to the FY start
+    fiscal_year = np.where(missing, 0, shifted // 12 + 1970)
+    fiscal_month = np.where(missing, 0, shifted % 12 + 1)
+    return (pd.arrays.IntegerArray(fiscal_year.astype('int16'), missing),
+            pd.arrays.IntegerArray(fiscal_month.astype('int8'), missing))
+
+
+def fiscal_labels(fiscal_year, fmt=LABEL_FORMAT, missing=None):
+    """Format fiscal years as labels, building each distinct label only once."""
+    years = pd.array(fiscal_year, dtype='Int16')
+    valid = ~years.isna()
+    labels = np.full(len(years), missing, dtype=object)
+    if valid.any():
+        values = years[valid].to_numpy(dtype='int64')
+        first = values.min()
+        lookup = np.array([fmt.format(start=y, end=y + 1) for y in range(first, values.max() + 1)], dtype=object)
+        labels[valid] = lookup[values - first]
+    return labels
+
+
+def fiscal_month_names(start_month=FISCAL_YEAR_START_MONTH):
+    """{fiscal month number: month abbreviation}, e.g. {1: 'Jul', ..., 12: 'Jun'}."""
+    return {i + 1: calendar.month_abbr[(start_month - 1 + i) % 12 + 1] for i in range(12)}
+
+
+def add_fiscal_columns(df, date_column, start_month=FISCAL_YEAR_START_MONTH):
+    """Add fiscal_year, fiscal_year_label and fiscal_month_num from one datetime column."""
+    fiscal_year, fiscal_month = fiscal_calendar(df[date_column].to_numpy(), start_month)
+    df['fiscal_year'] = fiscal_year
+    df['fiscal_year_label'] = pd.Series(fiscal_labels(fiscal_year), index=df.index, dtype='str')
+    df['fiscal_month_num'] = fiscal_month
+    return df
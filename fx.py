@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from data_cache import load_cached
+
+# FRED series per currency and whether the series is quoted as USD per unit
+# (True) or as units per USD (False)
+FRED_SERIES = {
+    'GBP': ('DEXUSUK', True),
+    'AUD': ('DEXUSAL', True),
+    'EUR': ('DEXUSEU', True),
+    'CAD': ('DEXCAUS', False),
+    'SGD': ('DEXSIUS', False),
+    'CHF': ('DEXSZUS', False),
+}
+
+
+def parse_fred_csv(path):
+    df = pd.read_csv(path)
+    df['DATE'] = pd.to_datetime(df['DATE'], errors='coerce')
+    return df.dropna(subset=['DATE']).sort_values('DATE', ignore_index=True)
+
+
+def load_fred_series(series, directory="."):
+    """Read one DEX*_exchange_rates.csv file (through the Feather cache) as a date-indexed Series."""
+    df = load_cached(series, f"{directory}/{series}_exchange_rates.csv", parse_fred_csv)
+    return df.set_index('DATE')[series]
+
+
+class RateTable:
+    """USD conversion factors per currency on a shared, sorted date index.
+
+    Each column holds the multiplier that turns one unit of the currency into
+    USD, so series quoted as units per USD are inverted once at build time
+    instead of once per payment. Gaps are forward filled, and the date of the
+    observation each cell came from is kept so stale lookups can be counted.
+    """
+
+    def __init__(self, series):
+        frame = pd.DataFrame(series).sort_index()
+        self.currencies = list(frame.columns)
+        self.dates = frame.index.values.astype('datetime64[ns]')
+
+        factors = np.empty(frame.shape, dtype='float64')
+        observed = np.empty(frame.shape, dtype='datetime64[ns]')
+        for i, currency in enumerate(self.currencies):
+            rates = frame[currency]
+            rate_dates = pd.Series(frame.index.where(rates.notna()), index=frame.index)
+            rates = rates.ffill().bfill().to_numpy(dtype='float64')
+            factors[:, i] = rates if FRED_SERIES[currency][1] else 1.0 / rates
+            observed[:, i] = rate_dates.ffill().bfill().values
+        self.factors = factors
+        self.observed = observed
+
+    @classmethod
+    def from_csv(cls, directory="."):
+        return cls({currency: load_fred_series(series, directory)
+                    for currency, (series, _) in FRED_SERIES.items()})
+
+    def lookup(self, currencies, dates):
+        """Resolve the USD factor for every (currency, date) pair.
+
+        Uses the latest observation on or before each date (nearest prior
+        business day); dates before the first observation fall back to the
+        earliest one. Currencies without a FRED series (USD and anything
+        unknown) keep a factor of 1.
+
+        Returns the factors and a boolean mask of rows whose rate was not
+        observed on the payment date itself.
+        """
+        codes = pd.Index(self.currencies).get_indexer(currencies)  # -1 for currencies without a series
+        dates = pd.to_datetime(np.asarray(dates)).values.astype('datetime64[ns]')
+
+        factors = np.ones(len(codes), dtype='float64')
+        stale = np.zeros(len(codes), dtype=bool)
+        rows = np.flatnonzero((codes >= 0) & ~np.isnat(dates))
+        if len(rows) == 0 or len(self.dates) == 0:
+            factors[codes >= 0] = np.nan
+            return factors, stale
+
+        pos = np.searchsorted(self.dates, dates[rows], side='right') - 1
+        pos = np.clip(pos, 0, len(self.dates) - 1)
+        factors[rows] = self.factors[pos, codes[rows]]
+        stale[rows] = self.observed[pos, codes[rows]] != dates[rows]
+        factors[(codes >= 0) & np.isnat(dates)] = np.nan
+        return factors, stale
+
+    def convert(self, amounts, currencies, dates):
+        """Convert whole amount/currency/date columns to USD in one pass.
+
+        Returns the USD amounts and a small report with the number of rows
+        that used a stale rate and the number that could not be converted.
+        """
+        factors, stale = self.lookup(currencies, dates)
+        usd = np.asarray(amounts, dtype='float64') * factors
+        report = {'rows': len(usd), 'stale': int(stale.sum()), 'missing': int(np.isnan(factors).sum())}
+        return usd, report
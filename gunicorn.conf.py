@@ -0,0 +1,30 @@
+"""Production serving profile for the dashboard.
+
+    gunicorn -c gunicorn.conf.py dash_app:server
+
+Workers and threads come from WEB_CONCURRENCY and GUNICORN_THREADS (or the
+usual gunicorn command-line flags). The app, and with it every dataset, is
+loaded once in the master and shared with the forked workers copy-on-write.
+With OFTW_PAGE_LOADING=lazy (or warm) the master only registers the pages and
+each worker builds a page's data on its first visit (warm: in the background
+from its first request), trading shared memory for a faster start.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', 8050)}")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+preload_app = True
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG")
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach, so garbage
+    # collection in the workers does not write to (and copy) the shared pages
+    gc.freeze()
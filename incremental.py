@@ -0,0 +1,243 @@
+"""Append-only daily refresh of the converted payments and their aggregates.
+
+    python incremental.py [--payments one-for-the-world-payments.csv]
+
+A full build (currency_converter.py) converts the whole payments snapshot
+and saves the cube cells (cube.payment_cells) and a state file in
+aggregates/. After that, payments are only ever appended to the snapshot,
+so a refresh reads the snapshot from the byte offset it stopped at last
+time, converts just those rows, appends them to exchange_rates.csv, merges
+their cells into the saved ones and bumps the dataset version. Its cost
+follows the day's volume, not the size of the history. Cell measures are
+integer units, so the merged cells equal those of a full rebuild exactly.
+
+Every step can be retried: the appended rows are truncated back to the
+size recorded in the state before they are written again, and the merged
+cells go to a new file that only the atomically written state points to.
+Truncating is only safe while exchange_rates.csv still starts with the
+output the state describes, so the bytes before that size are checked
+first: a full build that wrote a new output but died before saving its
+state leaves a file that does not match, and the refresh rebuilds.
+The build manifest is updated last with the new snapshot and output hashes,
+so currency_converter.py still skips a build when nothing changed since.
+If the snapshot was rewritten rather than appended to (it shrank, or the
+bytes before the saved offset changed), the refresh also falls back to a
+full build. Rows converted earlier keep the FX rate they were converted with.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+
+import pandas as pd
+
+from cube import merge_cells, payment_cells
+from data_cache import atomic_write, file_sha256
+
+AGGREGATES_DIR = os.environ.get("OFTW_AGGREGATES_DIR", "aggregates")
+STATE_FILE = "state.json"
+
+TAIL_BYTES = 1 << 16  # bytes before the offset that must be unchanged for an append-only refresh
+
+
+def read_state(directory=AGGREGATES_DIR):
+    try:
+        with open(os.path.join(directory, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+    atomic_write(path, write)
+
+
+def tail_sha256(path, offset):
+    """SHA-256 of the TAIL_BYTES bytes of path that end at offset."""
+    with open(path, 'rb') as f:
+        f.seek(max(offset - TAIL_BYTES, 0))
+        return hashlib.sha256(f.read(min(offset, TAIL_BYTES))).hexdigest()
+
+
+def _output_stamp(output_path):
+    stat = os.stat(output_path)
+    return {'output': output_path, 'output_size': stat.st_size, 'output_mtime_ns': stat.st_mtime_ns}
+
+
+def _output_state(output_path):
+    """_output_stamp plus the hash of the output's last bytes, which output_matches checks."""
+    stamp = _output_stamp(output_path)
+    return dict(stamp, output_tail_sha256=tail_sha256(output_path, stamp['output_size']))
+
+
+def output_matches(state, output_path):
+    """Whether output_path still starts with the output state describes (rows appended after it are fine)."""
+    size = state['output_size']
+    return (os.path.getsize(output_path) >= size
+            and tail_sha256(output_path, size) == state.get('output_tail_sha256'))
+
+
+def save(directory, cells, state):
+    """Write cells under a new name, then point the state at it; the previous cells file is removed."""
+    os.makedirs(directory, exist_ok=True)
+    previous = read_state(directory)
+    state = dict(state, cells=f"cells-{state['version']}.csv")
+    atomic_write(os.path.join(directory, state['cells']), lambda tmp_path: cells.to_csv(tmp_path, index=False))
+    _write_json(os.path.join(directory, STATE_FILE), state)
+    if previous and previous.get('cells') not in (None, state['cells']):
+        try:
+            os.remove(os.path.join(directory, previous['cells']))
+        except OSError:
+            pass
+    return state
+
+
+def load_cells(state, directory=AGGREGATES_DIR):
+    """The saved cells of state, with the dimensions in their cube dtypes."""
+    cells = pd.read_csv(os.path.join(directory, state['cells']),
+                        dtype={'payment_platform': 'str', state['source_field']: 'str'})
+    return cells.astype({'fiscal_year': 'Int16', 'fiscal_month_num': 'Int8'})
+
+
+def load_fresh_cells(output_path, directory=AGGREGATES_DIR):
+    """(cells, state) when the saved aggregates describe output_path as it is now, else (None, state)."""
+    state = read_state(directory)
+    if state is None or not os.path.exists(output_path):
+        return None, state
+    stamp = _output_stamp(output_path)
+    if (state.get('output_size'), state.get('output_mtime_ns')) != (stamp['output_size'], stamp['output_mtime_ns']):
+        return None, state
+    return load_cells(state, directory), state
+
+
+def cells_of(df_converted):
+    """Cube cells of converted payments (the same preparation data_store applies)."""
+    from data_store import payments_source_field, prepare_payments  # data_store reads the saved cells
+
+    prepared = prepare_payments(df_converted)
+    source_field = payments_source_field(prepared)
+    return payment_cells(prepared, source_field), source_field
+
+
+def save_baseline(df_converted, snapshot_path, output_path, directory=AGGREGATES_DIR):
+    """Aggregates of a full build: df_converted holds every converted payment written to output_path."""
+    cells, source_field = cells_of(df_converted.copy())
+    previous = read_state(directory) or {}
+    offset = os.path.getsize(snapshot_path)
+    return save(directory, cells, dict(
+        _output_state(output_path), version=previous.get('version', 0) + 1, source_field=source_field,
+        snapshot=snapshot_path, snapshot_offset=offset, snapshot_tail_sha256=tail_sha256(snapshot_path, offset),
+        rows=len(df_converted), appended_rows=0))
+
+
+def read_new_rows(snapshot_path, offset):
+    """Complete CSV lines of snapshot_path after offset, parsed with its header; and the new offset."""
+    with open(snapshot_path, 'rb') as f:
+        header = f.readline()
+        f.seek(max(offset, len(header)))
+        body = f.read()
+    body = body[:body.rfind(b'\n') + 1]  # a line still being written waits for the next refresh
+    if not body.strip():
+        return None, offset
+    return pd.read_csv(io.BytesIO(header + body)), max(offset, len(header)) + len(body)
+
+
+def append_rows(output_path, df, size):
+    """Truncate output_path to size (undoing a half-done earlier append), then append df without a header.
+
+    The caller checks first (output_matches) that the bytes before size are
+    the ones the state was saved with.
+    """
+    columns = pd.read_csv(output_path, nrows=0).columns
+    with open(output_path, 'r+b') as f:
+        f.truncate(size)
+    with open(output_path, 'a', newline='') as f:
+        df.reindex(columns=columns).to_csv(f, header=False, index=False)
+
+
+def refresh_manifest(manifest_path, snapshot_path, output_path, offset, report):
+    """Record an append-only refresh in the build manifest, so a later build without --force can skip.
+
+    The snapshot's hash is only updated when every byte of it was converted;
+    with a partial last line left over, the next build converts it in full.
+    """
+    import currency_converter
+
+    manifest = currency_converter.read_manifest(manifest_path)
+    inputs = manifest.get('inputs')
+    if not inputs:
+        return
+    key = next((path for path in inputs if os.path.realpath(path) == os.path.realpath(snapshot_path)), snapshot_path)
+    size = os.path.getsize(snapshot_path)
+    inputs[key] = file_sha256(snapshot_path) if offset == size else None
+    previous = manifest.get('report') or {}
+    currency_converter.write_manifest(manifest_path, dict(
+        manifest, inputs=inputs, snapshot_size=size, output_sha256=file_sha256(output_path),
+        report={name: previous.get(name, 0) + report[name] for name in ('rows', 'stale', 'missing')}))
+
+
+def update(snapshot_path, output_path, manifest_path, fx_directory=".", directory=AGGREGATES_DIR):
+    """Convert and merge the rows appended to snapshot_path since the last build or update.
+
+    Returns the number of new rows, or None when a full build was needed instead.
+    """
+    import currency_converter
+    from fx import RateTable
+
+    state = read_state(directory)
+    size = os.path.getsize(snapshot_path)
+    if (state is None or snapshot_path.endswith(".json")
+            or os.path.realpath(state.get('snapshot', '')) != os.path.realpath(snapshot_path)
+            or not os.path.exists(output_path) or not output_matches(state, output_path)
+            or size < state['snapshot_offset']
+            or tail_sha256(snapshot_path, state['snapshot_offset']) != state['snapshot_tail_sha256']):
+        print(f"{snapshot_path} or {output_path} changed other than by appending since the last build: "
+              "rebuilding in full")
+        currency_converter.build(snapshot_path, output_path, manifest_path, fx_directory, force=True,
+                                 aggregates_dir=directory)
+        return None
+
+    new_rows, offset = read_new_rows(snapshot_path, state['snapshot_offset'])
+    if new_rows is None:
+        print("no new payments")
+        return 0
+
+    new_rows['date'] = pd.to_datetime(new_rows['date'], errors='coerce')
+    converted, report = currency_converter.convert_payments(new_rows, RateTable.from_csv(fx_directory))
+    print(f"Converted {report['rows']} new payments: {report['stale']} used a stale rate, "
+          f"{report['missing']} could not be converted")
+
+    append_rows(output_path, converted, state['output_size'])
+    cells, source_field = cells_of(converted.copy())
+    if source_field != state['source_field']:
+        raise ValueError(f"new payments are grouped by {source_field!r}, the saved cells by {state['source_field']!r}")
+    save(directory, merge_cells(load_cells(state, directory), cells), dict(
+        state, **_output_state(output_path), version=state['version'] + 1, snapshot_offset=offset,
+        snapshot_tail_sha256=tail_sha256(snapshot_path, offset), rows=state['rows'] + len(converted),
+        appended_rows=state.get('appended_rows', 0) + len(converted)))
+    refresh_manifest(manifest_path, snapshot_path, output_path, offset, report)
+    return len(converted)
+
+
+def main(argv=None):
+    import currency_converter
+
+    parser = argparse.ArgumentParser(description="Convert and merge the payments appended since the last build.")
+    parser.add_argument('--payments', default=currency_converter.PAYMENTS_SNAPSHOT, help="local payments snapshot (CSV)")
+    parser.add_argument('--output', default=currency_converter.OUTPUT_FILE)
+    parser.add_argument('--manifest', default=currency_converter.MANIFEST_FILE)
+    parser.add_argument('--fx-directory', default=".", help="directory holding the DEX*_exchange_rates.csv files")
+    parser.add_argument('--aggregates', default=AGGREGATES_DIR, help="directory of the saved cells and state")
+    args = parser.parse_args(argv)
+
+    update(args.payments, args.output, args.manifest, args.fx_directory, args.aggregates)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
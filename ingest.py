@@ -0,0 +1,231 @@
+"""Streaming ingestion of the OFTW JSON exports into CSV.
+
+The JSON array is parsed incrementally from the HTTP response, records are
+converted to typed column batches and appended to the output CSV one batch
+at a time, so peak memory is bounded by the batch size rather than the
+payload. After every batch a small progress file records how many records
+were written, the matching byte offset in the source and the output size.
+An interrupted run resumes from there: with an HTTP Range request when the
+server supports it, otherwise by skipping the records already written. A
+response that ends before the array's closing bracket raises
+IncompleteStreamError after saving what it did get, so running again picks
+up where it stopped.
+
+The columns are the union of the keys of every record, in order of first
+appearance. When a batch brings a key the earlier ones did not have, the
+CSV written so far is rewritten once with the new column added (empty for
+the earlier rows).
+"""
+import codecs
+import csv
+import json
+import os
+import time
+
+import pandas as pd
+import requests
+
+from data_cache import atomic_write
+
+PAYMENTS_URL = "https://storage.googleapis.com/plotly-app-challenge/one-for-the-world-payments.json"
+PLEDGES_URL = "https://storage.googleapis.com/plotly-app-challenge/one-for-the-world-pledges.json"
+
+DEFAULT_BATCH_SIZE = 50_000
+CHUNK_SIZE = 1 << 20
+
+# Numeric columns of the payments and pledges exports; everything else stays text
+NUMERIC_COLUMNS = ['amount', 'amount_usd', 'counterfactuality', 'contribution_amount']
+
+WHITESPACE = " \t\r\n"
+
+
+class IncompleteStreamError(ValueError):
+    """The source ended before the closing bracket of its JSON array; running again resumes it."""
+
+
+class JsonArrayStream:
+    """Yield the elements of a top-level JSON array from an iterable of byte chunks.
+
+    offset is the source byte position just after the last element yielded,
+    counted from base_offset. Set in_array when the chunks start inside the
+    array (a resumed Range request), i.e. after the opening bracket.
+    """
+
+    def __init__(self, chunks, base_offset=0, in_array=False):
+        self.chunks = chunks
+        self.offset = base_offset
+        self.in_array = in_array
+        self.complete = False
+        self._decoder = json.JSONDecoder()
+
+    def _advance(self, text):
+        self.offset += len(text) if text.isascii() else len(text.encode('utf-8'))
+
+    def __iter__(self):
+        utf8 = codecs.getincrementaldecoder('utf-8')()
+        buf = ''
+        for chunk in self.chunks:
+            buf += utf8.decode(chunk)
+            pos = 0
+            while True:
+                start = pos
+                while pos < len(buf) and buf[pos] in WHITESPACE:
+                    pos += 1
+                if pos >= len(buf):
+                    break
+                if not self.in_array:
+                    if buf[pos] != '[':
+                        raise ValueError(f"expected a JSON array at byte {self.offset}")
+                    self.in_array = True
+                    pos += 1
+                    self._advance(buf[start:pos])
+                    continue
+                if buf[pos] == ']':
+                    self.complete = True
+                    return
+                if buf[pos] == ',':
+                    pos += 1
+                    self._advance(buf[start:pos])
+                    continue
+                try:
+                    record, end = self._decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    pos = start
+                    break  # element continues in the next chunk
+                self._advance(buf[start:end])
+                pos = end
+                yield record
+            buf = buf[pos:]
+        raise IncompleteStreamError(f"JSON array ends without its closing bracket at byte {self.offset}"
+                                    + (" (in the middle of an element)" if buf.strip() else ""))
+
+
+def to_frame(records, columns):
+    """One batch of records as a DataFrame with the numeric columns typed."""
+    df = pd.DataFrame.from_records(records, columns=columns)
+    for column in NUMERIC_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+
+def _add_columns(out_path, columns, new_columns):
+    """Rewrite the CSV at out_path with new_columns appended, empty in the rows already written."""
+    def write(tmp_path):
+        with open(out_path, newline='') as src, open(tmp_path, 'w', newline='') as dst:
+            reader, writer = csv.reader(src), csv.writer(dst, lineterminator=os.linesep)  # as pandas writes
+            header = next(reader)
+            if header != columns:
+                raise ValueError(f"{out_path} has columns {header}, expected {columns}")
+            writer.writerow(header + new_columns)
+            padding = [''] * len(new_columns)
+            for row in reader:
+                writer.writerow(row + padding)
+    atomic_write(out_path, write)
+
+
+def _csv_columns(out_path):
+    with open(out_path, newline='') as f:
+        return next(csv.reader(f), None)
+
+
+def _read_progress(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_progress(path, progress):
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(progress, f)
+    atomic_write(path, write)
+
+
+def ingest(url, out_path, batch_size=DEFAULT_BATCH_SIZE, resume=True, max_records=None,
+           session=None, log=print):
+    """Stream the JSON array at url into out_path as CSV, batch by batch.
+
+    max_records stops early (leaving the progress file for a later resume).
+    Raises IncompleteStreamError, after writing every complete record it
+    got, when the response ends before the array does.
+    Returns {'records', 'seconds', 'rows_per_sec', 'resumed_from'}.
+    """
+    session = session or requests.Session()
+    progress_path = out_path + ".progress.json"
+    progress = _read_progress(progress_path) if resume and os.path.exists(out_path) else None
+    if progress and (os.path.getsize(out_path) < progress['out_bytes']
+                     or _csv_columns(out_path) != progress['columns']):
+        progress = None  # not the CSV the progress describes, e.g. a column rewrite was cut off
+
+    if progress:
+        with open(out_path, 'r+b') as f:
+            f.truncate(progress['out_bytes'])  # drop a batch that was half written
+        written, columns = progress['records'], progress['columns']
+    else:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        written, columns = 0, None
+    resumed_from = written
+
+    headers = {'Range': f"bytes={progress['source_bytes']}-"} if progress else {}
+    response = session.get(url, stream=True, headers=headers, timeout=60)
+    response.raise_for_status()
+    if progress and response.status_code == 206:
+        stream = JsonArrayStream(response.iter_content(CHUNK_SIZE), progress['source_bytes'], in_array=True)
+        skip = 0
+    else:
+        stream = JsonArrayStream(response.iter_content(CHUNK_SIZE))
+        skip = written
+
+    start = time.perf_counter()
+    batch = []
+
+    def flush():
+        nonlocal written, columns
+        keys = list(dict.fromkeys(key for record in batch for key in record))
+        if columns is None:
+            columns = keys
+        new_columns = [key for key in keys if key not in columns]
+        if new_columns:
+            if written:
+                log(f"new columns {new_columns}: rewriting the {written:,} records written so far")
+                _add_columns(out_path, columns, new_columns)
+            columns = columns + new_columns
+        to_frame(batch, columns).to_csv(out_path, mode='a', header=written == 0, index=False)
+        written += len(batch)
+        batch.clear()
+        _write_progress(progress_path, {'records': written, 'source_bytes': stream.offset,
+                                        'out_bytes': os.path.getsize(out_path), 'columns': columns})
+        elapsed = time.perf_counter() - start
+        log(f"{written:,} records written ({(written - resumed_from) / elapsed:,.0f} rows/s)")
+
+    try:
+        try:
+            for record in stream:
+                if skip:
+                    skip -= 1
+                    continue
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    flush()
+                if max_records is not None and written + len(batch) >= max_records:
+                    break
+        except IncompleteStreamError:
+            if batch:
+                flush()  # keep what arrived; the progress file points just after it
+            log(f"stream ended early after {written:,} records; run again to resume")
+            raise
+        if batch:
+            flush()
+        if stream.complete and os.path.exists(progress_path):
+            os.remove(progress_path)
+    finally:
+        response.close()
+
+    seconds = time.perf_counter() - start
+    new_records = written - resumed_from
+    return {'records': written, 'seconds': seconds,
+            'rows_per_sec': new_records / seconds if seconds else float('inf'), 'resumed_from': resumed_from}
@@ -0,0 +1,268 @@
+"""Local background job manager for long-running Dash callbacks.
+
+Callbacks registered with background=True run in a forked child process, so
+request threads return immediately and the browser polls for progress and
+the result. The child inherits the datasets already loaded in the worker
+(copy-on-write), and results, progress and set_props updates go through a
+directory of pickle files (memo.DiskBackend) that every gunicorn worker on
+the host shares. No broker is needed.
+
+Identical in-flight jobs (same callback, normalized inputs and dataset
+version) are de-duplicated: later requests subscribe to the running process
+instead of starting another. When a user changes the filter again, Dash
+cancels their previous job; the process is only killed once every
+subscriber has cancelled.
+
+The manager plugs into Dash's background callback machinery, including a
+few private modules, so it is written against Dash 4.4: importing it with a
+Dash whose internals moved fails with an error naming the version.
+"""
+import fcntl
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+import warnings
+from contextlib import contextmanager
+from contextvars import copy_context
+
+import dash
+from dash.exceptions import PreventUpdate
+
+SUPPORTED_DASH = "4.4"
+
+try:  # private Dash modules: their layout changes between releases
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+    from dash.background_callback._proxy_set_props import ProxySetProps
+    from dash.background_callback.managers import BaseBackgroundCallbackManager
+except ImportError as err:
+    raise ImportError(f"jobs.LocalJobManager is written against Dash {SUPPORTED_DASH}.x and cannot run on "
+                      f"Dash {dash.__version__}: {err}") from err
+
+if not dash.__version__.startswith(SUPPORTED_DASH + "."):
+    warnings.warn(f"jobs.LocalJobManager is written against Dash {SUPPORTED_DASH}.x, not {dash.__version__}; "
+                  f"background callbacks may misbehave", RuntimeWarning)
+
+from data_cache import CACHE_DIR
+from memo import _MISSING, DiskBackend, normalize
+from metrics import JOB_CACHE_REQUESTS, collect_phases, observe_phases
+
+DEFAULT_MAXSIZE = 1024
+
+
+def _process_stat(pid):
+    """(state, start time) of a process from /proc, or None if it does not exist."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return fields[0], fields[19]
+
+
+def _job_alive(job):
+    """Whether the process recorded in job is still running (and is still that process)."""
+    if not job:
+        return False
+    stat = _process_stat(job['pid'])
+    if stat is not None:
+        return stat[0] != 'Z' and stat[1] == job['started']
+    try:  # no /proc: fall back to signal 0
+        os.kill(job['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class LocalJobManager(BaseBackgroundCallbackManager):
+    """Background callback manager running each job in a forked process.
+
+    directory holds the shared job state (OFTW_JOBS_DIR, else a jobs/ folder
+    in the data cache). cache_by is a list of zero-argument callables (e.g.
+    the dataset version) added to every job key; with it, finished results are
+    kept and reused by later identical requests, LRU-bounded by maxsize.
+    How requests were answered is counted in metrics.JOB_CACHE_REQUESTS
+    (see cache_info()).
+    """
+
+    def __init__(self, directory=None, cache_by=None, maxsize=DEFAULT_MAXSIZE):
+        directory = directory or os.environ.get("OFTW_JOBS_DIR") or os.path.join(CACHE_DIR, "jobs")
+        self.store = DiskBackend(directory, maxsize)
+        self._lock_path = os.path.join(directory, "jobs.lock")
+        self._thread_lock = threading.Lock()
+        self._context = multiprocessing.get_context('fork')
+        super().__init__(cache_by)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive across threads and worker processes sharing the directory."""
+        with self._thread_lock, open(self._lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _get(self, *key):
+        value = self.store.get(key)
+        return None if value is _MISSING else value
+
+    def build_cache_key(self, fn, args, cache_args_to_ignore, triggered):
+        # Normalized inputs: multi-select order and empty selections don't matter
+        if isinstance(args, dict):
+            args = {k: normalize(v) for k, v in args.items()}
+        else:
+            args = [normalize(a) for a in args]
+        return super().build_cache_key(fn, args, cache_args_to_ignore, triggered)
+
+    def make_job_fn(self, fn, progress, key=None):
+        return _make_job_fn(fn, self.store, progress)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        """Start the job for key, or join the identical one already running.
+
+        Returns the job's pid, or 0 when a cached result already exists.
+        """
+        multiprocessing.active_children()  # reap finished jobs of this worker
+        with self._locked():
+            if self.cache_by is not None and self.result_ready(key):
+                JOB_CACHE_REQUESTS.inc('hit')
+                return 0
+            job = self._get('job', key)
+            if _job_alive(job):
+                self.store.set(('subscribers', job['pid']), (self._get('subscribers', job['pid']) or 0) + 1)
+                JOB_CACHE_REQUESTS.inc('joined')
+                return job['pid']
+            JOB_CACHE_REQUESTS.inc('miss')
+
+            self.store.delete((self._make_progress_key(key),))
+            process = self._context.Process(target=job_fn, args=(key, self._make_progress_key(key), args, context),
+                                            daemon=True)
+            process.start()
+            stat = _process_stat(process.pid)
+            self.store.set(('job', key), {'pid': process.pid, 'started': stat and stat[1]})
+            self.store.set(('pid', process.pid), key)
+            self.store.set(('subscribers', process.pid), 1)
+            return process.pid
+
+    def cache_info(self):
+        """Requests of this process answered from a cached result, by a running job or by a new job."""
+        return {'hits': JOB_CACHE_REQUESTS.value('hit'), 'joined': JOB_CACHE_REQUESTS.value('joined'),
+                'misses': JOB_CACHE_REQUESTS.value('miss')}
+
+    def terminate_job(self, job):
+        """Cancel one subscriber's interest in a job; kill it when nobody is left waiting."""
+        job = int(job or 0)
+        if not job:
+            return
+        with self._locked():
+            key = self._get('pid', job)
+            if key is None:
+                return
+            remaining = (self._get('subscribers', job) or 1) - 1
+            record = self._get('job', key)
+            if remaining > 0 or self.result_ready(key):
+                self.store.set(('subscribers', job), max(remaining, 0))
+                return
+            if record and record['pid'] == job and _job_alive(record):
+                try:
+                    os.kill(job, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            for entry in [('job', key), ('pid', job), ('subscribers', job)]:
+                self.store.delete(entry)
+        multiprocessing.active_children()
+
+    def terminate_unhealthy_job(self, job):
+        return False
+
+    def job_running(self, job):
+        job = int(job or 0)
+        if not job:
+            return False
+        multiprocessing.active_children()
+        key = self._get('pid', job)
+        return key is not None and _job_alive(self._get('job', key))
+
+    def get_progress(self, key):
+        # Not removed on read: every subscriber of a shared job polls it
+        return self._get(self._make_progress_key(key))
+
+    def result_ready(self, key):
+        return self._get('result', key) is not None
+
+    def get_result(self, key, job):
+        result = self.store.get(('result', key))
+        if result is _MISSING:
+            return self.UNDEFINED
+        if self.cache_by is None:
+            self.store.delete(('result', key))
+        timing = self.store.get(('timing', key))
+        if timing is not _MISSING:  # the job's phases, recorded once in the worker that collects it
+            self.store.delete(('timing', key))
+            observe_phases(f"{timing['callback']} [job]", timing['phases'], timing['total'])
+        return result
+
+    def get_updated_props(self, key):
+        result = self._get(self._make_set_props_key(key))
+        if result is None:
+            return {}
+        self.store.delete((self._make_set_props_key(key),))
+        return result
+
+    def clear_cache_entry(self, key):
+        self.store.delete(('result', key))
+
+    def get_or_create_signing_secret(self, generate):
+        with self._locked():
+            secret = self._get(self.SIGNING_SECRET_KEY)
+            if secret is None:
+                secret = generate()
+                self.store.set((self.SIGNING_SECRET_KEY,), secret)
+            return secret
+
+
+def _make_job_fn(fn, store, progress):
+    """Body of the child process: run the callback and store its result (or error) and phase timings."""
+    func = getattr(fn, '__wrapped__', fn)
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    def job_fn(result_key, progress_key, user_callback_args, context):
+        def set_progress(value):
+            store.set((progress_key,), list(value) if isinstance(value, (list, tuple)) else [value])
+
+        def set_props(_id, props):
+            store.set((BaseBackgroundCallbackManager._make_set_props_key(result_key),), {_id: props})
+
+        def run():
+            ctx = AttributeDict(**context)
+            ctx.ignore_register_page = False
+            ctx.updated_props = ProxySetProps(set_props)
+            context_value.set(ctx)
+            args = [set_progress] if progress else []
+            with collect_phases() as phases:
+                start = time.perf_counter()
+                try:
+                    if isinstance(user_callback_args, dict):
+                        result = fn(*args, **user_callback_args)
+                    elif isinstance(user_callback_args, (list, tuple)):
+                        result = fn(*args, *user_callback_args)
+                    else:
+                        result = fn(*args, user_callback_args)
+                except PreventUpdate:
+                    result = {"_dash_no_update": "_dash_no_update"}
+                except Exception as err:  # reported to the browser like a failing callback
+                    result = {"background_callback_error": {"msg": str(err), "tb": traceback.format_exc()}}
+                total = time.perf_counter() - start
+            # Written before the result, so whoever sees the result also finds the timing
+            store.set(('timing', result_key), {'callback': name, 'phases': phases, 'total': total})
+            store.set(('result', result_key), result)
+
+        copy_context().run(run)
+
+    return job_fn
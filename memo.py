@@ -0,0 +1,91 @@
+"""Shared result storage for cached Dash callbacks.
+
+DiskBackend is a size-bounded LRU of pickle files in a directory that every
+worker on the host shares; normalize() turns callback inputs into cache-key
+form (multi-select lists sorted, empty selections treated as None). The
+background job manager (jobs.py) keeps its jobs and results with them.
+"""
+import hashlib
+import os
+import pickle
+
+from data_cache import atomic_write
+
+DEFAULT_MAXSIZE = 256
+
+_MISSING = object()
+
+
+class DiskBackend:
+    """LRU of pickle files in a directory shared between worker processes.
+
+    Recency is the file mtime, refreshed on every hit; the oldest files are
+    removed once the directory holds more than maxsize entries.
+    """
+
+    def __init__(self, directory, maxsize=DEFAULT_MAXSIZE):
+        self.directory = directory
+        self.maxsize = maxsize
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest() + ".pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return _MISSING
+        return value
+
+    def set(self, key, value):
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write(self._path(key), write)
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                try:
+                    entries.append((entry.stat().st_mtime_ns, entry.path))
+                except OSError:
+                    pass
+        for _, path in sorted(entries)[:max(0, len(entries) - self.maxsize)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".pkl"))
+
+
+def normalize(value):
+    """Canonical, hashable form of a callback input."""
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return None
+        return tuple(sorted((normalize(v) for v in value), key=lambda v: (type(v).__name__, repr(v))))
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    return value
@@ -0,0 +1,316 @@
+"""Per-callback performance instrumentation and a Prometheus /metrics route.
+
+instrument(app) wraps every server-side callback the app registers. For
+each call it records the wall time, split into phases, in in-process
+histograms:
+
+- data: code a callback marks with `with phase('data')`: dataset, cube and
+  index queries.
+- figure: code marked with `with phase('figure')`: building figures or patches.
+- serialize: JSON encoding of the response (dash's to_json). It is timed by
+  wrapping a private Dash function, so only on the Dash release that was
+  checked (SERIALIZE_HOOK_DASH); on others it stays at 0.
+- compute: everything else, i.e. unmarked work and dash's own dispatch.
+
+It also records the response payload bytes and the input cardinality (the
+number of selected values across all inputs), and counts how background
+callback requests were answered by the job cache (jobs.LocalJobManager).
+Metrics are per process; under gunicorn each worker reports its own.
+Background callbacks are measured in the request that starts or polls them;
+the phases of the job itself come back with its result (jobs.py) and are
+recorded under "<callback> [job]".
+
+Setting OFTW_PROFILE_SLOW_MS enables a sampling profiler: while a callback
+runs, its thread's stack is sampled every few milliseconds. When the
+callback takes longer than the threshold, the samples are written as
+collapsed stacks (flamegraph.pl / speedscope input) to OFTW_PROFILE_DIR.
+"""
+import bisect
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import dash
+import dash._callback
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+CARDINALITY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 1000)
+
+PHASES = ('compute', 'data', 'figure', 'serialize')
+
+# Dash release whose private dash._callback.to_json the serialize phase wraps
+SERIALIZE_HOOK_DASH = "4.4"
+
+PROFILE_INTERVAL = 0.005
+
+# Phase seconds of the callback running in the current thread (None outside callbacks)
+_phases = contextvars.ContextVar('callback_phases', default=None)
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with cumulative buckets per label set."""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[labels] = (counts, total + value)
+
+    def snapshot(self):
+        """{labels: {'buckets': [(le, cumulative count)], 'count', 'sum'}}."""
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        result = {}
+        for labels, (counts, total) in series.items():
+            cumulative = []
+            running = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                running += count
+                cumulative.append((bound, running))
+            result[labels] = {'buckets': cumulative, 'count': running, 'sum': total}
+        return result
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, data in sorted(self.snapshot().items()):
+            pairs = [f'{key}="{_escape(value)}"' for key, value in zip(self.labelnames, labels)]
+            for bound, count in data['buckets']:
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{{{','.join(pairs + [le])}}} {count}")
+            lines.append(f"{self.name}_sum{{{','.join(pairs)}}} {data['sum']!r}")
+            lines.append(f"{self.name}_count{{{','.join(pairs)}}} {data['count']}")
+        return "\n".join(lines)
+
+
+class LabeledCounter:
+    """Thread-safe Prometheus-style counter per label set."""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values[labels]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            pairs = [f'{key}="{_escape(label)}"' for key, label in zip(self.labelnames, labels)]
+            lines.append(f"{self.name}{{{','.join(pairs)}}} {value}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+CALLBACK_SECONDS = Histogram('dash_callback_seconds', "Callback wall time by phase (phase=total is the sum).",
+                             ('callback', 'phase'), LATENCY_BUCKETS)
+CALLBACK_PAYLOAD_BYTES = Histogram('dash_callback_payload_bytes', "Size of the JSON callback response.",
+                                   ('callback',), BYTES_BUCKETS)
+CALLBACK_INPUT_CARDINALITY = Histogram('dash_callback_input_cardinality',
+                                       "Values across the callback inputs (list items count one each).",
+                                       ('callback',), CARDINALITY_BUCKETS)
+
+JOB_CACHE_REQUESTS = LabeledCounter('dash_job_cache_requests_total',
+                                    "Background callback requests by outcome: hit (cached result), "
+                                    "joined (identical job running) or miss (new job).", ('outcome',))
+
+HISTOGRAMS = [CALLBACK_SECONDS, CALLBACK_PAYLOAD_BYTES, CALLBACK_INPUT_CARDINALITY]
+COUNTERS = [JOB_CACHE_REQUESTS]
+
+
+@contextmanager
+def phase(name):
+    """Count the enclosed block toward a phase of the running callback (no-op outside one)."""
+    phases = _phases.get()
+    if phases is None or phases['_active']:
+        yield  # not in a callback, or nested inside another timed phase
+        return
+    phases['_active'] = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] += time.perf_counter() - start
+        phases['_active'] = False
+
+
+@contextmanager
+def collect_phases():
+    """Collect the phase() timings of the enclosed callback run into the yielded dict."""
+    phases = {name: 0.0 for name in PHASES}
+    phases['_active'] = False
+    token = _phases.set(phases)
+    try:
+        yield phases
+    finally:
+        _phases.reset(token)
+
+
+def observe_phases(name, phases, total):
+    """Record one callback run: its total and each phase, compute being whatever the marked phases left."""
+    phases = dict(phases, compute=max(total - sum(phases[p] for p in PHASES if p != 'compute'), 0.0))
+    CALLBACK_SECONDS.observe(total, name, 'total')
+    for phase_name in PHASES:
+        CALLBACK_SECONDS.observe(phases[phase_name], name, phase_name)
+
+
+def _timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def input_cardinality(values):
+    """Number of values across the inputs: list items count one each, None counts zero."""
+    total = 0
+    for value in values:
+        if value is None:
+            continue
+        total += len(value) if isinstance(value, (list, tuple, dict)) else 1
+    return total
+
+
+class SamplingProfiler:
+    """Samples one thread's stack on a timer thread and aggregates collapsed stacks."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _callback_name(entry, output):
+    func = getattr(entry['callback'], '__wrapped__', None)
+    if func is None:
+        return output
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def _instrument_callback(name, callback, slow_seconds, profile_dir):
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        profiler = SamplingProfiler(threading.get_ident()) if slow_seconds is not None else None
+        with collect_phases() as phases:
+            start = time.perf_counter()
+            try:
+                if profiler:
+                    with profiler:
+                        result = callback(*args, **kwargs)
+                else:
+                    result = callback(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - start
+
+        observe_phases(name, phases, total)
+        if isinstance(result, (str, bytes)):
+            CALLBACK_PAYLOAD_BYTES.observe(len(result), name)
+        CALLBACK_INPUT_CARDINALITY.observe(input_cardinality(args), name)
+
+        if profiler and profiler.samples and total >= slow_seconds:
+            os.makedirs(profile_dir, exist_ok=True)
+            path = os.path.join(profile_dir, f"{name}-{time.time_ns()}-{int(total * 1000)}ms.folded")
+            profiler.dump(path)
+        return result
+
+    wrapper._instrumented = True
+    return wrapper
+
+
+def render():
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in HISTOGRAMS + COUNTERS) + "\n"
+
+
+def instrument(app, slow_ms=None, profile_dir=None):
+    """Time every callback of app and serve the metrics at /metrics.
+
+    slow_ms (default OFTW_PROFILE_SLOW_MS, off when unset) turns on the
+    sampling profiler; profiles go to profile_dir (OFTW_PROFILE_DIR, default
+    'profiles').
+    """
+    slow_ms = slow_ms if slow_ms is not None else os.environ.get("OFTW_PROFILE_SLOW_MS")
+    slow_seconds = float(slow_ms) / 1000 if slow_ms not in (None, "") else None
+    profile_dir = profile_dir or os.environ.get("OFTW_PROFILE_DIR", "profiles")
+
+    # Serialize phase: wrap dash's response encoder, only where its private name was checked
+    to_json = getattr(dash._callback, 'to_json', None)
+    if (dash.__version__.startswith(SERIALIZE_HOOK_DASH + ".") and callable(to_json)
+            and not getattr(to_json, '_instrumented', False)):
+        dash._callback.to_json = _timed('serialize', to_json)
+        dash._callback.to_json._instrumented = True
+
+    wrapped = 0
+
+    def wrap_callbacks():
+        # Page callbacks (dash.callback) join app.callback_map on the first request; after that
+        # the map only changes if callbacks are registered late, so other requests skip the scan
+        nonlocal wrapped
+        if len(app.callback_map) == wrapped:
+            return
+        for output, entry in app.callback_map.items():
+            if 'callback' in entry and not getattr(entry['callback'], '_instrumented', False):
+                entry['callback'] = _instrument_callback(_callback_name(entry, output), entry['callback'],
+                                                         slow_seconds, profile_dir)
+        wrapped = len(app.callback_map)
+
+    app.server.before_request(wrap_callbacks)
+
+    @app.server.route("/metrics")
+    def metrics():
+        return render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    return app
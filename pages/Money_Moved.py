@@ -1,71 +1,54 @@
-from dash import Dash, dcc, html, register_page, Input, Output, callback
+from dash import dcc, html, register_page, Input, Output, State, Patch, callback, clientside_callback
 import dash_ag_grid as dag
 import plotly.express as px
-import pandas as pd
 from datetime import datetime
 
-register_page(__name__, path="/Money_Moved")
-
-# Load exchange rates-enhanced payments data
-df_payments = pd.read_csv("exchange_rates.csv")
-df_payments['date'] = pd.to_datetime(df_payments['date'])
+from data_store import get_view, payments_source_field, register_view
+from metrics import phase
+from row_model import RowModel, column_filter_type
 
-# Load pledges
-df_pledges = pd.read_csv("one-for-the-world-pledges.csv")
-df_pledges['pledge_created_at'] = pd.to_datetime(df_pledges['pledge_created_at'], errors='coerce')
+register_page(__name__, path="/Money_Moved")
 
-# Fiscal year window
+# Fiscal year window (FY 2024-2025 runs Jul 2024 - Jun 2025)
 start_fy = datetime(2024, 7, 1)
 end_fy = datetime(2025, 6, 30)
-
-# Source detection
-if 'source' in df_payments.columns:
-    source_field = 'source'
-elif 'chapter_name' in df_payments.columns:
-    source_field = 'chapter_name'
-elif 'payment_source' in df_payments.columns:
-    source_field = 'payment_source'
-else:
-    df_payments['derived_source'] = df_payments['payment_platform'].apply(
-        lambda x: 'Corporate' if x == 'Benevity' else 'Individual' if x == 'Stripe' else 'Other'
-    )
-    source_field = 'derived_source'
+ytd_fiscal_years = [start_fy.year]
 
 # Pink color palette (no red)
 colors = ['#FFB6C1', '#FF69B4', '#FF85A2', '#FFC0CB', '#FFA6C9', '#FFD1DC']
 
 # FILTERS
-filter_section = html.Div([
-    html.Div([
-        html.Label("Platform", style={"color": "white"}),
-        dcc.Dropdown(
-            id='platform-filter',
-            options=[{"label": x, "value": x} for x in sorted(df_payments['payment_platform'].dropna().unique())],
-            multi=True,
-            placeholder="Choose Platform",
-            style={'color': 'black', 'width': '200px'}
-        )
-    ])
-], style={
-    'display': 'flex',
-    'flexDirection': 'row',
-    'gap': '30px',
-    'marginBottom': '40px',
-    'justifyContent': 'center'
-})
-
-# Add Row Number column
-df_payments['Row Number'] = range(1, len(df_payments) + 1)
-
-# AG Grid
-grid = dag.AgGrid(
-    id='payments-table',
-    rowData=df_payments.to_dict("records"),
-    columnDefs=[{"field": i, "checkboxSelection": True, "headerCheckboxSelection": True, "rowSelection": "multiple", 'filter': True, 'sortable': True} for i in df_payments.columns] + 
-               [{"field": "Row Number", "headerName": "Row Number", "sortable": True, "filter": True}],  # Add row number column
-    dashGridOptions={"pagination": True},
-    className="ag-theme-alpine-dark"
-)
+def filter_section(view):
+    return html.Div([
+        html.Div([
+            html.Label("Platform", style={"color": "white"}),
+            dcc.Dropdown(
+                id='platform-filter',
+                options=[{"label": x, "value": x} for x in view['platforms']],
+                multi=True,
+                placeholder="Choose Platform",
+                style={'color': 'black', 'width': '200px'}
+            )
+        ])
+    ], style={
+        'display': 'flex',
+        'flexDirection': 'row',
+        'gap': '30px',
+        'marginBottom': '40px',
+        'justifyContent': 'center'
+    })
+
+# AG Grid (infinite row model: rows are sliced on the server one block at a time)
+def grid(view):
+    df_payments = view['payments']
+    return dag.AgGrid(
+        id='payments-table',
+        rowModelType="infinite",
+        columnDefs=[{"field": i, "checkboxSelection": True, "rowSelection": "multiple", 'filter': column_filter_type(df_payments[i]), 'sortable': True} for i in df_payments.columns] + 
+                   [{"headerName": "Row Number", "valueGetter": {"function": "params.node.rowIndex + 1"}}],  # Row number computed in the grid
+        dashGridOptions={"pagination": True, "paginationPageSize": 100, "cacheBlockSize": 100},
+        className="ag-theme-alpine-dark"
+    )
 
 # KPI Card
 def kpi_card(title, value, prefix="$", suffix=""):
@@ -82,121 +65,40 @@ def kpi_card(title, value, prefix="$", suffix=""):
         'margin': '10px'
     })
 
-# KPI placeholders (initial values)
-df_payments_ytd = df_payments[(df_payments['date'] >= start_fy) & (df_payments['date'] <= end_fy)]
-money_moved_total = df_payments_ytd['amount_usd'].sum()
-monthly_avg = df_payments_ytd.groupby(df_payments_ytd['date'].dt.to_period('M'))['amount_usd'].sum().mean()
-counterfactual_mm = df_payments_ytd['counterfactuality'].sum()
-
-# INITIAL GRAPHS
-platform_totals = df_payments_ytd.groupby('payment_platform')['amount_usd'].sum().reset_index()
-source_totals = df_payments_ytd.groupby(source_field)['amount_usd'].sum().reset_index()
-
-source_fig = px.bar(
-    source_totals,
-    x=source_field,
-    y='amount_usd',
-    title=f"Money Moved by {source_field.replace('_', ' ').title()}",
-    labels={"amount_usd": "Total Money Moved (USD)"},
-    color=source_field,
-    color_discrete_sequence=['#1E90FF', '#4682B4', '#5F9EA0', '#ADD8E6', '#87CEFA']  # Kék árnyalatok
-)
-source_fig.update_layout(
-    plot_bgcolor='#1a1a1a',  # Sötét háttér
-    paper_bgcolor='#1a1a1a',  # Sötét háttér
-    font=dict(color='white'),
-    title_font=dict(color='white'),
-    xaxis=dict(tickcolor='white', showgrid=True, gridcolor='gray'),
-    yaxis=dict(tickcolor='white', showgrid=True, gridcolor='gray'),
-    showlegend=False
-)
-
-pie_fig = px.pie(
-    platform_totals,
-    names='payment_platform',
-    values='amount_usd',
-    hole=0.4,
-    title="Money Moved by Platform (Donut)",
-    color_discrete_sequence=['#1E90FF', '#4682B4', '#5F9EA0', '#ADD8E6', '#87CEFA']  # Kék árnyalatok
-)
-pie_fig.update_layout(
-    plot_bgcolor='#1a1a1a',  # Sötét háttér
-    paper_bgcolor='#1a1a1a',  # Sötét háttér
-    font=dict(color='white'),
-    title_font=dict(color='white'),
-    legend_font_color='white'
-)
-
-# LAYOUT
-layout = html.Div([
-    filter_section,
-
-    html.Div([
-        kpi_card("Money Moved (Total YTD)", money_moved_total),
-        kpi_card("Counterfactual Money Moved", counterfactual_mm),
-        kpi_card("Monthly Avg Money Moved", monthly_avg),
-    ], style={
-        'display': 'flex',
-        'flexDirection': 'row',
-        'gap': '20px',
-        'justifyContent': 'center',
-        'padding': '10px',
-    }),
-
-    html.Br(),
-
-    html.Div([
-        dcc.Graph(id='pie-fig', figure=pie_fig),
-        dcc.Graph(id='source-fig', figure=source_fig),
-    ], style={
-        'display': 'flex',
-        'flexDirection': 'row',
-        'gap': '50px',
-        'justifyContent': 'center',
-        'alignItems': 'start',
-    }),
-
-    grid
-], style={
-    'backgroundColor': '#1a1a1a',  # Sötét háttér
-    'color': 'white',
-    'padding': '40px',
-    'minHeight': '100vh'
-})
-
-# CALLBACK
-@callback(
-    Output('payments-table', 'rowData'),
-    Output('pie-fig', 'figure'),
-    Output('source-fig', 'figure'),
-    Input('platform-filter', 'value')
-)
-def update_dashboard(selected_platforms):
-    filtered = df_payments.copy()
-
-    if selected_platforms:
-        filtered = filtered[filtered['payment_platform'].isin(selected_platforms)]
-
-    # Pie chart
-    pie = px.pie(
-        filtered.groupby('payment_platform')['amount_usd'].sum().reset_index(),
-        names='payment_platform',
-        values='amount_usd',
-        hole=0.4,
-        title="Money Moved by Platform (Donut)",
-        color_discrete_sequence=['#1E90FF', '#4682B4', '#5F9EA0', '#ADD8E6', '#87CEFA']  # Kék árnyalatok
-    )
-    pie.update_layout(
-        plot_bgcolor='#1a1a1a',  # Sötét háttér
-        paper_bgcolor='#1a1a1a',  # Sötét háttér
-        font=dict(color='white'),
-        title_font=dict(color='white'),
-        legend_font_color='white'
-    )
-
-    # Source bar chart
-    source = px.bar(
-        filtered.groupby(source_field)['amount_usd'].sum().reset_index(),
+@register_view('money_moved')
+def build_view(dataset):
+    """Everything this page derives from one dataset version, built once per version."""
+    # Shared payments data (read-only); KPIs and charts are summed from the cube's cells
+    df_payments = dataset.payments()
+    source_field = payments_source_field(df_payments)
+    cube = dataset.payments_cube()
+
+    # GRAPHS: built once with the full theme; the platform filter only patches their trace data
+    source_fig, pie_fig = build_figures(cube, source_field)
+
+    return {
+        'payments': df_payments,
+        'source_field': source_field,
+        'cube': cube,
+        'row_model': RowModel(df_payments),
+        'platforms': sorted(df_payments['payment_platform'].dropna().unique()),
+        # KPI placeholders (initial values)
+        'money_moved_total': cube.total('amount_usd', fiscal_years=ytd_fiscal_years),
+        'monthly_avg': cube.monthly_average('amount_usd', fiscal_years=ytd_fiscal_years),
+        'counterfactual_mm': cube.total('counterfactuality', fiscal_years=ytd_fiscal_years),
+        'source_fig': source_fig,
+        'pie_fig': pie_fig,
+        # One bar trace per source, in figure order
+        'source_names': [trace.name for trace in source_fig.data],
+    }
+
+
+def build_figures(cube, source_field):
+    platform_totals = cube.query('payment_platform')
+    source_totals = cube.query(source_field)
+
+    source_fig = px.bar(
+        source_totals,
         x=source_field,
         y='amount_usd',
         title=f"Money Moved by {source_field.replace('_', ' ').title()}",
@@ -204,7 +106,7 @@ def update_dashboard(selected_platforms):
         color=source_field,
         color_discrete_sequence=['#1E90FF', '#4682B4', '#5F9EA0', '#ADD8E6', '#87CEFA']  # Kék árnyalatok
     )
-    source.update_layout(
+    source_fig.update_layout(
         plot_bgcolor='#1a1a1a',  # Sötét háttér
         paper_bgcolor='#1a1a1a',  # Sötét háttér
         font=dict(color='white'),
@@ -214,4 +116,129 @@ def update_dashboard(selected_platforms):
         showlegend=False
     )
 
-    return filtered.to_dict("records"), pie, source
+    pie_fig = px.pie(
+        platform_totals,
+        names='payment_platform',
+        values='amount_usd',
+        hole=0.4,
+        title="Money Moved by Platform (Donut)",
+        color_discrete_sequence=['#1E90FF', '#4682B4', '#5F9EA0', '#ADD8E6', '#87CEFA']  # Kék árnyalatok
+    )
+    pie_fig.update_layout(
+        plot_bgcolor='#1a1a1a',  # Sötét háttér
+        paper_bgcolor='#1a1a1a',  # Sötét háttér
+        font=dict(color='white'),
+        title_font=dict(color='white'),
+        legend_font_color='white'
+    )
+    return source_fig, pie_fig
+
+
+# LAYOUT (built per request from the current dataset version)
+def layout(**kwargs):
+    view = get_view('money_moved')
+    return html.Div([
+        filter_section(view),
+
+        html.Div([
+            kpi_card("Money Moved (Total YTD)", view['money_moved_total']),
+            kpi_card("Counterfactual Money Moved", view['counterfactual_mm']),
+            kpi_card("Monthly Avg Money Moved", view['monthly_avg']),
+        ], style={
+            'display': 'flex',
+            'flexDirection': 'row',
+            'gap': '20px',
+            'justifyContent': 'center',
+            'padding': '10px',
+        }),
+
+        html.Br(),
+
+        html.Div([
+            dcc.Graph(id='pie-fig', figure=view['pie_fig']),
+            dcc.Graph(id='source-fig', figure=view['source_fig']),
+        ], style={
+            'display': 'flex',
+            'flexDirection': 'row',
+            'gap': '50px',
+            'justifyContent': 'center',
+            'alignItems': 'start',
+        }),
+
+        # Shown while the charts are recomputed in the background
+        html.Div(id='dashboard-progress', style={'display': 'none', 'textAlign': 'center', 'marginBottom': '20px'}),
+
+        grid(view),
+        dcc.Store(id='payments-table-refresh')
+    ], style={
+        'backgroundColor': '#1a1a1a',  # Sötét háttér
+        'color': 'white',
+        'padding': '40px',
+        'minHeight': '100vh'
+    })
+
+# CALLBACKS
+@callback(
+    Output('payments-table', 'getRowsResponse'),
+    Input('payments-table', 'getRowsRequest'),
+    State('platform-filter', 'value')
+)
+def get_payment_rows(request, selected_platforms):
+    view = get_view('money_moved')
+    mask = view['payments']['payment_platform'].isin(selected_platforms).to_numpy() if selected_platforms else None
+    return view['row_model'].get_rows(request, mask)
+
+
+# Drop the grid's cached blocks when the platform filter changes, so it asks for rows again
+clientside_callback(
+    """
+    function(selected_platforms) {
+        const api = dash_ag_grid.getApi('payments-table');
+        if (api) { api.purgeInfiniteCache(); }
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output('payments-table-refresh', 'data'),
+    Input('platform-filter', 'value'),
+    prevent_initial_call=True
+)
+
+
+@callback(
+    Output('pie-fig', 'figure'),
+    Output('source-fig', 'figure'),
+    Input('platform-filter', 'value'),
+    prevent_initial_call=True,
+    background=True,
+    progress=[Output('dashboard-progress', 'children')],
+    running=[(Output('dashboard-progress', 'style'), {'display': 'block', 'textAlign': 'center', 'marginBottom': '20px'},
+              {'display': 'none'})],
+    interval=250
+)
+def update_dashboard(set_progress, selected_platforms):
+    # Runs as a background job (jobs.LocalJobManager): changing the filter again
+    # cancels it, and results are cached per dataset version
+    with phase('data'):
+        view = get_view('money_moved')
+        cube, source_field = view['cube'], view['source_field']
+    set_progress("Updating platform totals...")
+
+    # Pie chart: replace slice labels and values only
+    with phase('data'):
+        platform_totals = cube.query('payment_platform', platforms=selected_platforms)
+    with phase('figure'):
+        pie = Patch()
+        pie['data'][0]['labels'] = platform_totals['payment_platform'].astype(str).tolist()
+        pie['data'][0]['values'] = platform_totals['amount_usd'].tolist()
+
+    # Source bar chart: one y value per existing trace
+    set_progress("Updating source totals...")
+    with phase('data'):
+        source_totals = cube.query(source_field, platforms=selected_platforms)
+    with phase('figure'):
+        totals = dict(zip(source_totals[source_field].astype(str), source_totals['amount_usd']))
+        source = Patch()
+        for i, name in enumerate(view['source_names']):
+            source['data'][i]['y'] = [float(totals.get(name, 0.0))]
+
+    return pie, source
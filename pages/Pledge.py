@@ -1,57 +1,81 @@
-from dash import dcc, html, register_page
+from dash import dcc, html, register_page, callback, Input, Output
 import plotly.express as px
 import pandas as pd
-from datetime import datetime
+
+from data_store import get_pledge_intervals, get_view, register_view
+from fiscal import fiscal_labels
 
 # Regisztrálás a fő app számára
 register_page(__name__, path="/Pledge")
 
-# Load and preprocess data
-file_path = "one-for-the-world-pledges.csv"
-df = pd.read_csv(file_path, parse_dates=['pledge_created_at', 'pledge_ended_at'])
-
-# Ensure pledge_starts_at is properly converted to datetime
-df['pledge_starts_at'] = pd.to_datetime(df['pledge_starts_at'], errors='coerce')
-
-# Define fiscal year function
-def get_fiscal_year(date):
-    if pd.isna(date):  # Handle NaT (Not a Time) values
-        return "Unknown"
-    return f"FY{date.year + 1}" if date.month >= 7 else f"FY{date.year}"
-
-df['fiscal_year'] = df['pledge_starts_at'].apply(get_fiscal_year)
-
-df['monthly_contribution'] = df['contribution_amount'] / 12  # Normalize to monthly
 
-# Filtering
-active_pledges = df[df['pledge_status'] == 'Active donor']
-future_pledges = df[df['pledge_starts_at'] > pd.Timestamp.today()]
+@register_view('pledge', dated=True)
+def build_view(dataset):
+    """Attrition rate and the ARR and retention charts of one dataset version (pledges USD-converted and annualized)."""
+    # Monthly Attrition Rate: mean share of active recurring pledges ending per month, over the
+    # last 12 complete months of data (the export can end well before today)
+    cohorts = dataset.cohorts()
+    attrition_rate = cohorts.average_monthly_churn(12) * 100
+    first, last = cohorts.churn_window(12)
+    attrition_window = f"{first:%b %Y} – {last:%b %Y}"
 
-# ARR calculations
-active_arr = active_pledges['contribution_amount'].sum()
-future_arr = future_pledges['contribution_amount'].sum()
-total_arr = active_arr + future_arr
+    # Retention: Kaplan-Meier survival of recurring pledges by cohort (fiscal year the pledge was created)
+    survival_df = cohorts.survival('cohort')
+    survival_df = survival_df.assign(cohort=fiscal_labels(survival_df['group'], fmt="FY{end}"))
 
-# Monthly contribution calculations
-active_monthly = active_pledges['monthly_contribution'].sum()
-future_monthly = future_pledges['monthly_contribution'].sum()
-total_monthly = active_monthly + future_monthly
+    # Monthly contribution at the end of each fiscal year, as of today for the one in progress (like the ARR cards)
+    combined_df = (dataset.pledge_arr() / 12).reset_index().melt(id_vars='fiscal_year', var_name='Type',
+                                                                 value_name='monthly_contribution')
+    combined_df = combined_df[(combined_df['Type'] == 'All Pledges') | (combined_df['monthly_contribution'] != 0)]
 
-# Monthly Attrition Rate (simplified: % of donors lost per month)
-attrition_rate = (df['pledge_status'] == 'Lapsed donor').mean() * 100
-
-# Aggregation by fiscal year
-fiscal_pledges = df.groupby('fiscal_year', as_index=False)['monthly_contribution'].sum()
-fiscal_active = active_pledges.groupby('fiscal_year', as_index=False)['monthly_contribution'].sum()
-fiscal_future = future_pledges.groupby('fiscal_year', as_index=False)['monthly_contribution'].sum()
+    # Line Chart
+    line_fig = px.line(
+        combined_df,
+        x='fiscal_year',
+        y='monthly_contribution',
+        color='Type',
+        title='Monthly Contributions by Pledge Type (Line Chart)',
+        labels={'monthly_contribution': 'Monthly Contribution (USD)', 'fiscal_year': 'Fiscal Year'},
+        markers=True,
+        line_shape='spline',
+        color_discrete_map={
+            'All Pledges': colors['primary'],
+            'Active Pledges': colors['highlight'],
+            'Future Pledges': colors['secondary']
+        }
+    )
+    line_fig.update_traces(line=dict(width=4),
+                           marker=dict(size=10))  # Thicker lines
+    line_fig.update_layout(
+        paper_bgcolor='black',
+        plot_bgcolor='black',
+        font=dict(color='white'),
+        title={'font': {'color': 'white'}},
+        xaxis=dict(showgrid=False),  # Grid removed
+        yaxis=dict(showgrid=False)   # Grid removed
+    )
 
-# Add category column
-fiscal_pledges['Type'] = 'All Pledges'
-fiscal_active['Type'] = 'Active Pledges'
-fiscal_future['Type'] = 'Future Pledges'
+    # Retention Chart
+    retention_fig = px.line(
+        survival_df,
+        x='months',
+        y='survival',
+        color='cohort',
+        title='Pledge Retention by Cohort',
+        labels={'months': 'Months Since Pledge Start', 'survival': 'Share Still Active', 'cohort': 'Cohort'},
+        line_shape='hv'
+    )
+    retention_fig.update_layout(
+        paper_bgcolor='black',
+        plot_bgcolor='black',
+        font=dict(color='white'),
+        title={'font': {'color': 'white'}},
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=False, tickformat='.0%')
+    )
+    return {'attrition_rate': attrition_rate, 'attrition_window': attrition_window, 'line_fig': line_fig,
+            'retention_fig': retention_fig}
 
-# Combine data
-combined_df = pd.concat([fiscal_pledges, fiscal_active, fiscal_future])
 
 # Color palette
 colors = {
@@ -61,57 +85,71 @@ colors = {
     'accent': '#FF0080',         # Extra color if needed
 }
 
-# Layout
-layout = html.Div([
-
-    # KPI Section
-    html.Div([  # KPI Section Here ...
-        html.Div(f"ALL ARR:   ${total_arr:,.2f} monthly", style={'fontSize': 24, 'fontWeight': 'bold', 'color': 'white', 'padding': '20px', 'borderRadius': '12px', 'backgroundColor': '#333', 'width': '300px', 'textAlign': 'center'}) if total_arr > 0 else None,
-        html.Div(f"Future ARR:   ${future_arr:,.2f} monthly", style={'fontSize': 24, 'fontWeight': 'bold', 'color': 'white', 'padding': '20px', 'borderRadius': '12px', 'backgroundColor': '#333', 'width': '300px', 'textAlign': 'center'}) if future_arr > 0 else None,
-        html.Div(f"Active ARR:   ${active_arr:,.2f} monthly", style={'fontSize': 24, 'fontWeight': 'bold', 'color': 'white', 'padding': '20px', 'borderRadius': '12px', 'backgroundColor': '#333', 'width': '300px', 'textAlign': 'center'}) if active_arr > 0 else None,
-        html.Div(f"Monthly Attrition Rate: {attrition_rate:.2f}%", style={'fontSize': 24, 'fontWeight': 'bold', 'color': 'red', 'padding': '20px', 'borderRadius': '12px', 'backgroundColor': '#333', 'width': '300px', 'textAlign': 'center'}) if attrition_rate > 0 else None,
-    ], style={
-        'marginBottom': '20px',
-        'display': 'flex',
-        'flexDirection': 'row',
-        'justifyContent': 'center',
-        'gap': '30px',
-        'flexWrap': 'wrap'
-    }),
-
-    # Line Chart
-    dcc.Graph(
-        id='pledges-line-chart',
-        figure=px.line(
-            combined_df,
-            x='fiscal_year',
-            y='monthly_contribution',
-            color='Type',
-            title='Monthly Contributions by Pledge Type (Line Chart)',
-            labels={'monthly_contribution': 'Monthly Contribution ($)', 'fiscal_year': 'Fiscal Year'},
-            markers=True,
-            line_shape='spline',
-            color_discrete_map={
-                'All Pledges': colors['primary'],
-                'Active Pledges': colors['highlight'],
-                'Future Pledges': colors['secondary']
-            }
-        )
-        .update_traces(line=dict(width=4),
-                       marker=dict(size=10))  # Thicker lines
-        .update_layout(
-            paper_bgcolor='black',
-            plot_bgcolor='black',
-            font=dict(color='white'),
-            title={'font': {'color': 'white'}},
-            xaxis=dict(showgrid=False),  # Grid removed
-            yaxis=dict(showgrid=False)   # Grid removed
+# Layout (built per request from the current dataset version)
+def layout(**kwargs):
+    view = get_view('pledge')
+    attrition_rate = view['attrition_rate']
+    attrition_window = view['attrition_window']
+    return html.Div([
+
+        # As-of date for the ARR cards (empty means today)
+        html.Div([
+            html.Span("ARR as of: ", style={'fontSize': 18, 'marginRight': '10px'}),
+            dcc.DatePickerSingle(id='pledges-as-of', placeholder='Today', clearable=True,
+                                 display_format='YYYY-MM-DD'),
+        ], style={'display': 'flex', 'alignItems': 'center', 'justifyContent': 'center', 'marginBottom': '20px'}),
+
+        # KPI Section
+        html.Div([  # KPI Section Here ...
+            html.Div(id='pledges-arr-kpis', style={'display': 'contents'}),
+            html.Div([f"Monthly Attrition Rate: {attrition_rate:.2f}%",
+                      html.Div(attrition_window, style={'fontSize': 14, 'fontWeight': 'normal'})], style={'fontSize': 24, 'fontWeight': 'bold', 'color': 'red', 'padding': '20px', 'borderRadius': '12px', 'backgroundColor': '#333', 'width': '300px', 'textAlign': 'center'}) if attrition_rate > 0 else None,
+        ], style={
+            'marginBottom': '20px',
+            'display': 'flex',
+            'flexDirection': 'row',
+            'justifyContent': 'center',
+            'gap': '30px',
+            'flexWrap': 'wrap'
+        }),
+
+        # Line Chart
+        dcc.Graph(
+            id='pledges-line-chart',
+            figure=view['line_fig']
+        ),
+
+        # Retention Chart
+        dcc.Graph(
+            id='pledges-retention-chart',
+            figure=view['retention_fig']
         )
-    )
 
-], style={
-    'backgroundColor': 'black',
-    'color': 'white',
-    'padding': '20px',
-    'minHeight': '100vh'
-})
+    ], style={
+        'backgroundColor': 'black',
+        'color': 'white',
+        'padding': '20px',
+        'minHeight': '100vh'
+    })
+
+
+def arr_card(label, value):
+    return html.Div(f"{label}:   ${value:,.2f} per year", style={'fontSize': 24, 'fontWeight': 'bold', 'color': 'white', 'padding': '20px', 'borderRadius': '12px', 'backgroundColor': '#333', 'width': '300px', 'textAlign': 'center'}) if value > 0 else None
+
+
+@callback(
+    Output('pledges-arr-kpis', 'children'),
+    Input('pledges-as-of', 'date')
+)
+def update_arr_kpis(as_of):
+    as_of = pd.Timestamp(as_of) if as_of else pd.Timestamp.today().normalize()
+    # Pledge lifetimes indexed by start/end date: active and future ARR as of any date
+    intervals = get_pledge_intervals()
+    active_count, active_arr = intervals.active_at(as_of)
+    _, future_arr = intervals.starting_after(as_of)
+    total_arr = active_arr + future_arr
+    return [
+        arr_card("ALL ARR", total_arr),
+        arr_card("Future ARR", future_arr),
+        arr_card(f"Active ARR ({active_count:,} pledges)", active_arr),
+    ]
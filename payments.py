@@ -1,16 +1,7 @@
-import pandas as pd
-import requests
+from ingest import PAYMENTS_URL, ingest
 
-# JSON adat letöltése
-json_url = "https://storage.googleapis.com/plotly-app-challenge/one-for-the-world-payments.json"
-response = requests.get(json_url)
-json_data = response.json()
-
-# JSON átalakítása DataFrame formátumba
-df_json = pd.DataFrame(json_data)
-
-# DataFrame mentése CSV fájlba
+# JSON adat letöltése és CSV-be írása darabonként (megszakítás után folytatható)
 csv_file_path = "one-for-the-world-payments.csv"
-df_json.to_csv(csv_file_path, index=False)
+stats = ingest(PAYMENTS_URL, csv_file_path)
 
-print(f"CSV fájl elmentve: {csv_file_path}")
+print(f"CSV fájl elmentve: {csv_file_path} ({stats['records']:,} sor, {stats['rows_per_sec']:,.0f} sor/s)")
@@ -0,0 +1,72 @@
+"""Vectorized pledge valuation: USD conversion, annualization and ARR per fiscal year.
+
+Each pledge is converted to USD at its pledge_starts_at date with the FRED
+rate table, then annualized by its frequency, so ARR figures no longer add
+up raw amounts in mixed currencies or divide every pledge by 12. ARR per
+fiscal year comes from the pledge lifetimes (intervals.PledgeIntervalIndex),
+the same point-in-time logic as the Pledge page's ARR cards.
+"""
+import numpy as np
+import pandas as pd
+
+from fiscal import FISCAL_YEAR_START_MONTH, fiscal_calendar, fiscal_labels
+
+# Payments per year for each pledge frequency. One-time gifts are not
+# recurring revenue, and a pledge without a frequency counts once a year.
+PAYMENTS_PER_YEAR = {
+    'Monthly': 12,
+    'Semi-Monthly': 24,
+    'Quarterly': 4,
+    'Annually': 1,
+    'One-Time': 0,
+    'Unspecified': 1,
+}
+
+
+def annualization_factors(frequency):
+    """Payments per year for every pledge (NaN for unknown frequencies)."""
+    codes = pd.Index(list(PAYMENTS_PER_YEAR)).get_indexer(frequency)
+    lookup = np.append(np.array(list(PAYMENTS_PER_YEAR.values()), dtype='float64'), np.nan)
+    return lookup[codes]  # code -1 (unknown) picks the trailing NaN
+
+
+def add_pledge_values(df, rates):
+    """Add contribution_usd, annual_usd and monthly_contribution (USD per month)."""
+    factors, _ = rates.lookup(df['currency'], df['pledge_starts_at'])
+    df['contribution_usd'] = df['contribution_amount'].to_numpy(dtype='float64') * factors
+    df['annual_usd'] = df['contribution_usd'] * annualization_factors(df['frequency'])
+    df['monthly_contribution'] = df['annual_usd'] / 12
+    return df
+
+
+def arr_by_fiscal_year(intervals, as_of=None):
+    """All, active and future ARR (annual USD) per fiscal year, from a PledgeIntervalIndex.
+
+    Each fiscal year is measured the way the ARR cards are: active is the
+    ARR of pledges running on its last day (on as_of, today by default, for
+    the year in progress), future the ARR of pledges starting after that day,
+    and all is the two together.
+    """
+    as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+    columns = ['All Pledges', 'Active Pledges', 'Future Pledges']
+    if not len(intervals.starts):
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='fiscal_year'), dtype='float64')
+
+    first, _ = fiscal_calendar(intervals.starts[:1])
+    last, _ = fiscal_calendar([as_of])
+    fiscal_years = np.arange(int(first[0]), int(last[0]) + 1)
+    year_ends = pd.to_datetime({'year': fiscal_years + 1, 'month': FISCAL_YEAR_START_MONTH, 'day': 1}) \
+        - pd.Timedelta(days=1)
+    dates = np.minimum(year_ends.to_numpy(), as_of.to_datetime64())
+
+    _, active = intervals.active_at(dates)
+    _, future = intervals.starting_after(dates)
+    totals = pd.DataFrame({'All Pledges': active + future, 'Active Pledges': active, 'Future Pledges': future},
+                          index=pd.Index(fiscal_labels(fiscal_years, fmt="FY{end}"), name='fiscal_year'))
+    return totals[columns]
+
+
+def arr_summary(by_fiscal_year):
+    """Total, active and future ARR (annual USD) of the last fiscal year (the one in progress)."""
+    latest = by_fiscal_year.iloc[-1]
+    return {'active': latest['Active Pledges'], 'future': latest['Future Pledges'], 'total': latest['All Pledges']}
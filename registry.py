@@ -0,0 +1,186 @@
+"""Versioned dataset registry with hot reload.
+
+The registry holds the current version of the data (a data_store.Dataset)
+and replaces it while the app keeps serving:
+
+- A watcher thread stats the converted data files every few seconds
+  (OFTW_RELOAD_INTERVAL, 0 turns it off). When their stamp changes it
+  builds the new version in the background, preloading everything the pages
+  need, and then swaps it in with a single reference assignment.
+- Every request is pinned to the version that was current when it started,
+  so all the callbacks and layouts of one request see the same data, never
+  a mix of old and new.
+- A replaced version stays alive while requests pinned to it are still
+  running and is dropped when the last of them finishes.
+
+Under gunicorn the watcher runs in each worker; it is started by the
+worker's first request, since threads do not survive the fork. The same
+goes for the optional warm-up thread, which preloads the current version
+in the background when the app starts without loading it (lazy pages).
+The warm-up thread is joined at interpreter exit, so a process that stops
+early never tears down in the middle of pandas or pyarrow code.
+"""
+import atexit
+import gc
+import os
+import sys
+import threading
+import time
+import traceback
+
+from flask import g, has_request_context
+
+DEFAULT_INTERVAL = 30.0
+
+
+class DatasetRegistry:
+    def __init__(self, build, stamp, interval=None, preload=True):
+        """build(stamp) returns a dataset with .version and .preload(); stamp() describes the source files.
+
+        With preload=False a reload swaps in the new version without building
+        anything; its pieces are built by the first requests that use them.
+        """
+        self._build = build
+        self._stamp = stamp
+        self.interval = float(os.environ.get("OFTW_RELOAD_INTERVAL", DEFAULT_INTERVAL)) if interval is None \
+            else interval
+        self._current = None
+        self._users = {}  # id(dataset) -> requests pinned to it
+        self._retired = []  # replaced versions still in use
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.preload = preload
+        self._watcher_pid = None
+        self._warmup_pid = None
+        self._warmup_thread = None
+        self.warmup_seconds = None  # how long the last warm-up took, once it finished
+        self.reloads = 0
+
+    def current(self):
+        """The version pinned to the running request, else the current one."""
+        if has_request_context():
+            pinned = g.get('dataset')
+            if pinned is not None:
+                return pinned
+        return self._latest()
+
+    def _latest(self):
+        if self._current is None:
+            with self._load_lock:  # first use: load synchronously, once
+                if self._current is None:
+                    self._current = self._build(self._stamp())
+        return self._current
+
+    def acquire(self):
+        """Pin the current version for one request; pair with release()."""
+        self._latest()
+        with self._lock:
+            dataset = self._current
+            self._users[id(dataset)] = self._users.get(id(dataset), 0) + 1
+        return dataset
+
+    def release(self, dataset):
+        with self._lock:
+            remaining = self._users.get(id(dataset), 1) - 1
+            if remaining > 0:
+                self._users[id(dataset)] = remaining
+                return
+            self._users.pop(id(dataset), None)
+            if any(old is dataset for old in self._retired):
+                self._retired = [old for old in self._retired if old is not dataset]
+
+    def swap(self, dataset):
+        """Make dataset the current version; the old one is kept until its requests finish."""
+        with self._lock:
+            old, self._current = self._current, dataset
+            if old is not None and self._users.get(id(old)):
+                self._retired.append(old)
+            self.reloads += 1
+        return old
+
+    def stats(self):
+        with self._lock:
+            return {'version': self._current.version if self._current else None, 'reloads': self.reloads,
+                    'retired_in_use': len(self._retired), 'pinned_requests': sum(self._users.values())}
+
+    def reload(self):
+        """Build and swap in a new version if the source files changed; True if it did."""
+        stamp = self._stamp()
+        if self._current is not None and stamp == self._current.version:
+            return False
+        dataset = self._build(stamp)
+        if self.preload:
+            dataset.preload()
+        self.swap(dataset)
+        gc.collect()  # the old version's frames are freed by refcounting; this catches cycles
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                if self.reload():
+                    print(f"[pid {os.getpid()}] dataset reloaded: {self._current.version}", file=sys.stderr)
+            except Exception:  # keep serving the current version; retry on the next tick
+                traceback.print_exc()
+
+    def start_watcher(self):
+        """Start the watcher thread in this process (no-op if running or disabled)."""
+        if self.interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name="dataset-watcher", daemon=True).start()
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        try:
+            self._latest().preload()
+        except Exception:  # the requests that need the missing pieces build (and report) them
+            traceback.print_exc()
+            return
+        self.warmup_seconds = time.perf_counter() - start
+        print(f"[pid {os.getpid()}] dataset warmed up in {self.warmup_seconds:.1f}s", file=sys.stderr)
+
+    def start_warmup(self):
+        """Preload the current version in a background thread of this process (once per process)."""
+        if self._warmup_pid == os.getpid():
+            return
+        with self._lock:
+            if self._warmup_pid == os.getpid():
+                return
+            self._warmup_pid = os.getpid()
+            self._warmup_thread = threading.Thread(target=self._warm_up, name="dataset-warmup", daemon=True)
+        self._warmup_thread.start()
+        atexit.register(self.wait_for_warmup)
+
+    def wait_for_warmup(self, timeout=None):
+        """Block until this process's warm-up thread (if any) has finished; True if it has."""
+        thread = self._warmup_thread
+        if thread is None or self._warmup_pid != os.getpid():
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def install(self, server, warm_up=False):
+        """Pin every request of the Flask server to one version, and watch for new ones.
+
+        warm_up=True also preloads the current version in the background,
+        starting with each process's first request.
+        """
+        @server.before_request
+        def pin_dataset():
+            self.start_watcher()
+            if warm_up:
+                self.start_warmup()
+            g.dataset = self.acquire()
+
+        @server.teardown_request
+        def unpin_dataset(exc=None):
+            dataset = g.pop('dataset', None)
+            if dataset is not None:
+                self.release(dataset)
+
+        return server
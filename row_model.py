@@ -0,0 +1,131 @@
+"""Server-side slicing for AG Grid's infinite row model.
+
+The grid asks for rows startRow..endRow with its current sort and filter
+model; RowModel answers from the shared frame so the payload is bounded by
+the block size, not the table size. Each column gets a sorted index and a
+dense rank once, on first use, so sorting a request never re-sorts the
+table.
+"""
+import numpy as np
+import pandas as pd
+
+TEXT_FILTERS = {
+    'contains': lambda s, v: s.str.contains(v, case=False, regex=False),
+    'notContains': lambda s, v: ~s.str.contains(v, case=False, regex=False),
+    'equals': lambda s, v: s.str.lower() == v.lower(),
+    'notEqual': lambda s, v: s.str.lower() != v.lower(),
+    'startsWith': lambda s, v: s.str.lower().str.startswith(v.lower()),
+    'endsWith': lambda s, v: s.str.lower().str.endswith(v.lower()),
+}
+
+COMPARISONS = {
+    'equals': lambda s, a, b: s == a,
+    'notEqual': lambda s, a, b: s != a,
+    'lessThan': lambda s, a, b: s < a,
+    'lessThanOrEqual': lambda s, a, b: s <= a,
+    'greaterThan': lambda s, a, b: s > a,
+    'greaterThanOrEqual': lambda s, a, b: s >= a,
+    'inRange': lambda s, a, b: (s >= a) & (s <= b),
+}
+
+
+def column_filter_type(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'agDateColumnFilter'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'agNumberColumnFilter'
+    return 'agTextColumnFilter'
+
+
+def json_records(page):
+    """page.to_dict('records'), with float32 columns sent as their shortest decimal (0.11, not 0.10999...)."""
+    float32 = [column for column, dtype in page.dtypes.items() if dtype == np.float32]
+    if float32:
+        page = page.astype({column: 'str' for column in float32}).astype({column: 'float64' for column in float32})
+    return page.to_dict("records")
+
+
+class RowModel:
+    def __init__(self, df):
+        self.df = df
+        self._order = {}
+        self._rank = {}
+
+    def _sort_key(self, column, descending=False):
+        """Integer sort key per row (dense rank); missing values sort last either way."""
+        if column not in self._rank:
+            codes = pd.factorize(self.df[column], sort=True)[0].astype('int64')
+            self._rank[column] = (codes, codes < 0)
+        codes, missing = self._rank[column]
+        key = -codes if descending else codes.copy()
+        key[missing] = np.iinfo('int64').max
+        return key
+
+    def _sort_index(self, column, descending=False):
+        """Stable row order for one column, computed once per direction."""
+        if (column, descending) not in self._order:
+            self._order[column, descending] = np.argsort(self._sort_key(column, descending), kind='stable')
+        return self._order[column, descending]
+
+    def _condition_mask(self, series, condition, filter_type):
+        kind = condition.get('type')
+        if kind == 'blank':
+            return series.isna()
+        if kind == 'notBlank':
+            return series.notna()
+
+        if filter_type == 'text':
+            values = series.astype('string').fillna('')
+            return TEXT_FILTERS[kind](values, str(condition.get('filter', '')))
+        if filter_type == 'date':
+            a = pd.Timestamp(condition.get('dateFrom'))
+            b = pd.Timestamp(condition['dateTo']) if condition.get('dateTo') else None
+            series = series.dt.normalize()
+        else:
+            a, b = condition.get('filter'), condition.get('filterTo')
+        return COMPARISONS[kind](series, a, b).fillna(False)
+
+    def filter_mask(self, filter_model):
+        """Boolean mask for an AG Grid filterModel (simple or combined conditions)."""
+        mask = np.ones(len(self.df), dtype=bool)
+        for column, model in (filter_model or {}).items():
+            if column not in self.df.columns:
+                continue
+            series = self.df[column]
+            filter_type = model.get('filterType', 'text')
+            if 'conditions' in model:
+                masks = [np.asarray(self._condition_mask(series, c, filter_type), dtype=bool)
+                         for c in model['conditions']]
+                combine = np.logical_or if model.get('operator') == 'OR' else np.logical_and
+                column_mask = combine.reduce(masks)
+            else:
+                column_mask = np.asarray(self._condition_mask(series, model, filter_type), dtype=bool)
+            mask &= column_mask
+        return mask
+
+    def sorted_rows(self, sort_model, mask):
+        """Positions of the rows selected by mask, in sort_model order."""
+        sort_model = [s for s in (sort_model or []) if s.get('colId') in self.df.columns]
+        if not sort_model:
+            return np.flatnonzero(mask)
+
+        if len(sort_model) == 1:
+            order = self._sort_index(sort_model[0]['colId'], sort_model[0].get('sort') == 'desc')
+            return order[mask[order]]
+
+        rows = np.flatnonzero(mask)
+        keys = [self._sort_key(s['colId'], s.get('sort') == 'desc')[rows] for s in reversed(sort_model)]
+        return rows[np.lexsort(keys)]
+
+    def get_rows(self, request, mask=None):
+        """Answer a getRowsRequest with {'rowData': [...], 'rowCount': n}."""
+        request = request or {}
+        rows_mask = self.filter_mask(request.get('filterModel'))
+        if mask is not None:
+            rows_mask &= np.asarray(mask, dtype=bool)
+
+        rows = self.sorted_rows(request.get('sortModel'), rows_mask)
+        start = request.get('startRow', 0)
+        end = request.get('endRow', start + 100)
+        page = self.df.iloc[rows[start:end]]
+        return {'rowData': json_records(page), 'rowCount': len(rows)}